@@ -54,3 +54,13 @@ def on_starting(server):
 
 def post_fork(server, worker):
     server.log.info(f"Worker spawned (pid: {worker.pid})")
+
+
+def worker_exit(server, worker):
+    """
+    Called in the worker just before it exits.
+    Commits any write-behind samples still queued, then closes the
+    worker's pooled SQLite connections (opened lazily after fork).
+    """
+    import owlogger
+    owlogger.shutdown()
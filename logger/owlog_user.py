@@ -31,16 +31,8 @@ class Database:
     def __init__(self, database="./logger_data.db"):
         # Create database if needed
         self.database = database
-        # log table
-        self.command(
-            """CREATE TABLE IF NOT EXISTS datalog (
-                id INTEGER PRIMARY KEY, 
-                date DATATIME DEFAULT CURRENT_TIMESTAMP, 
-                value TEXT
-            );""" )
-        self.command(
-            """CREATE INDEX IF NOT EXISTS idx_date ON datalog(date);"""
-            )
+        # datalog and the other log tables are left to owlogger.py,
+        # whose migrations keep their schema current
         # version table (single record)
         self.command(
             """CREATE TABLE IF NOT EXISTS version (
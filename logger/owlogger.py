@@ -34,10 +34,16 @@
 #  OWLOGGER_TOKEN        JWT secret for POST/PUT endpoints
 #  OWLOGGER_NO_PASSWORD  1 / true / yes  →  disable Basic-Auth
 #  OWLOGGER_ADDRESS      host:port for standalone mode only
+#  OWLOGGER_WRITE_BEHIND 1 / true / yes  →  queue POST/PUT samples, commit in batches
 #
 # ── TOML keys ─────────────────────────────────────────────────────────────
 #
 #  address, token, database, debug, no_password
+#  write_behind, write_behind_batch, write_behind_delay, write_behind_queue
+#  retain_raw_days, retain_hourly_days, retain_daily_days, retain_batch
+#  partition, cache_entries, cache_rows, frame_cache
+#  silence_minutes, search
+#  [[alert]] tables (see "Alert rules" below)
 #
 # ─────────────────────────────────────────────────────────────────────────────
 
@@ -45,17 +51,30 @@ import sqlite3
 import argparse
 import base64
 import datetime as dt
-from io import BytesIO
+from io import BytesIO, StringIO
+import csv
+import zlib
 import json
 import os
 import sys
 import re
 import math
-import random
+import glob
+import hashlib
+import fcntl
+import threading
+import weakref
+import queue
+import time
+import atexit
 import logging # forwarded to gunicorn
 import tomllib
 from urllib.parse import urlparse
+import urllib.request
+import subprocess
 from functools import wraps
+from contextlib import contextmanager
+from collections import OrderedDict
 
 logging.basicConfig(
     level=logging.INFO,
@@ -76,6 +95,12 @@ except ImportError:
     logging.error("PIL (Pillow) module needs to be installed. Do 'pip install Pillow' or 'apt install python3-pil'")
     sys.exit(1)
 
+# for faster plotting (optional)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # for authentication
 try:
     import jwt
@@ -95,9 +120,12 @@ app = Flask(__name__)
 # ---------------------------------------------------------------------------
 # Globals (set by init_app() before any request is served)
 # ---------------------------------------------------------------------------
-db          = None
-jwt_token   = None
-no_password = False
+db           = None
+jwt_token    = None
+no_password  = False
+write_behind = None   # WriteBehind queue when enabled, else direct writes
+retention    = {}     # enforce_retention() settings from the TOML file
+silence      = 3600   # seconds without data before /api/status flags a source
 
 _DEFAULT_CONFIG  = "/etc/owlogger/owlogger.toml"
 _DEFAULT_PORT    = 8001
@@ -175,7 +203,7 @@ def init_app(
 
     Returns (host, port) — only used by the standalone Flask server.
     """
-    global db, jwt_token, no_password
+    global db, jwt_token, no_password, write_behind, retention, silence, frames
 
     # ── TOML ──────────────────────────────────────────────────────────────
     cfg_path = config_path or os.environ.get("OWLOGGER_CONFIG") or _DEFAULT_CONFIG
@@ -203,12 +231,50 @@ def init_app(
         or toml.get("database")
         or _DEFAULT_DB
     )
-    db = Database(db_path)
+    try:
+        db = Database(
+            db_path,
+            partition     = toml.get("partition"),
+            cache_entries = toml.get("cache_entries", 256),
+            cache_rows    = toml.get("cache_rows", 200000),
+            alerts        = Alerts(toml.get("alert", [])) if toml.get("alert") else None,
+            search        = toml.get("search", False),
+        )
+    except ValueError as e:
+        logging.error(f"Configuration error: {e}")
+        sys.exit(1)
+
+    # ── rendered /ePaper and /test frames ──────────────────────────────────
+    frames = FrameCache(toml.get("frame_cache", 32))
+
+    # ── /api/status: sources quiet this long are reported silent ──────────
+    silence = toml.get("silence_minutes", 60) * 60
+
+    # ── retention (applied by --retention, e.g. from cron) ─────────────────
+    retention = {
+        "raw_days":    toml.get("retain_raw_days", 0),
+        "hourly_days": toml.get("retain_hourly_days", 0),
+        "daily_days":  toml.get("retain_daily_days", 0),
+        "batch":       toml.get("retain_batch", 5000),
+    }
+
+    # ── write-behind ingestion (opt-in) ────────────────────────────────────
+    if toml.get("write_behind", False) or _env_bool("OWLOGGER_WRITE_BEHIND"):
+        write_behind = WriteBehind(
+            db,
+            batch_size  = toml.get("write_behind_batch", WriteBehind.BATCH_SIZE),
+            batch_delay = toml.get("write_behind_delay", WriteBehind.BATCH_DELAY),
+            queue_size  = toml.get("write_behind_queue", WriteBehind.QUEUE_SIZE),
+        )
+        atexit.register(shutdown)
+    else:
+        write_behind = None
 
     logging.debug(
         f"[init_app] config={cfg_path!r} db={db_path!r} "
         f"no_password={no_password} "
-        f"jwt={'set' if jwt_token else 'unset'}"
+        f"jwt={'set' if jwt_token else 'unset'} "
+        f"write_behind={'on' if write_behind else 'off'}"
     )
 
     # ── address (standalone only; gunicorn binds via gunicorn.conf.py) ────
@@ -222,6 +288,14 @@ def init_app(
     return _address_tuple(addr_str, _DEFAULT_PORT)
 
 
+def shutdown():
+    """Flush queued samples and close database connections (worker exit)."""
+    if write_behind is not None:
+        write_behind.close()
+    if db is not None:
+        db.close()
+
+
 # ---------------------------------------------------------------------------
 # Auth helpers
 # ---------------------------------------------------------------------------
@@ -324,18 +398,64 @@ def require_jwt(f):
 # Frame-buffer / PNG routes
 # ---------------------------------------------------------------------------
 
+_DEJAVU = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+_ROBOTO = "/usr/share/fonts/truetype/roboto-condensed/Roboto-Condensed-Bold.ttf"
+
+# Fonts and point glyphs are loaded once per process, not per request
+_fonts = {}
+_glyphs = {}
+_glyph_lock = threading.Lock()
+
+# Chart backgrounds (grid, axis labels) by size, polarity, Y scale and time
+_templates = OrderedDict()
+_template_lock = threading.Lock()
+_TEMPLATES = 16
+_DASH_STEP = 9     # pixels from one grid dash to the next
+
+def _font(path, size, fallback=None):
+    """TrueType font from the cache; `fallback` (or PIL's default) if missing."""
+    key = (path, size)
+    if key not in _fonts:
+        try:
+            _fonts[key] = ImageFont.truetype(path, size=size)
+        except (IOError, OSError):
+            _fonts[key] = None
+    return _fonts[key] or fallback or ImageFont.load_default()
+
+def _glyph_sprites(size):
+    """
+    Point markers (A-Z and '#') pre-rendered as 1-bit masks for a font size:
+    {letter: (mask, x offset, y offset)} where the offsets centre the glyph.
+    The mask carries no colour, so both polarities share it (paste fills).
+    """
+    with _glyph_lock:
+        if size not in _glyphs:
+            font = _font(_DEJAVU, size)
+            sprites = {}
+            for a in [chr(i) for i in range( ord('A'), ord('Z')+1 )] + ['#']:
+                scratch = ImageDraw.Draw(Image.new('1', (1, 1)))
+                bbox = scratch.textbbox((0, 0), a, font=font)
+                mask = Image.new('1', (max(bbox[2], 1), max(bbox[3], 1)), 0)
+                ImageDraw.Draw(mask).text((0, 0), a, fill=1, font=font)
+                sprites[a] = ( mask, (bbox[2]-bbox[0])//2, (bbox[3]-bbox[1])//2 )
+            _glyphs[size] = sprites
+        return _glyphs[size]
+
 class BitMap:
     # send a bitmap to client
-    def __init__( self, width=800, height=480, black=1, white=0 ):
+    # mode "points": a letter per reading; "range": per pixel column, a bar
+    # from each source's min to max there (cost bounded by the width)
+    MODES = ( "points", "range" )
+
+    def __init__( self, width=800, height=480, black=1, white=0, mode="points" ):
         self.width = width
         self.height = height
+        self.mode = mode
         self.top_pad = 20
         self.bottom_pad = 20
         self.white = white
         self.black = black
 
-        self.NUM_REGEXP = re.compile(r"-?\d+\.?\d*|-?\.\d+")
-
         self.make_canvas()
         self.make_letters()
         
@@ -344,35 +464,22 @@ class BitMap:
         self.draw = ImageDraw.Draw(self.img)
 
     def make_letters( self ):
-        # Try to load a real font; fall back to PIL default
-        try:
-            self.font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", size=14)
-        except (IOError, OSError):
-            self.font = ImageFont.load_default()
-        try:
-            self.axisfont = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", size=20)
-        except (IOError, OSError):
-            self.axisfont = self.font
-        try:
-            self.keyfont = ImageFont.truetype("/usr/share/fonts/truetype/roboto-condensed/Roboto-Condensed-Bold.ttf", size=14)
-        except (IOError, OSError):
-            self.keyfont = self.font
+        # Try to load a real font; fall back to PIL default (cached per process)
+        self.font = _font(_DEJAVU, 14)
+        self.axisfont = _font(_DEJAVU, 20, self.font)
+        self.keyfont = _font(_ROBOTO, 14, self.font)
         self.caps = [chr(i) for i in range( ord('A'), ord('Z')+1 )]
         self.caps_len = len(self.caps)
-        self.bounds = {}
-        for a in self.caps:
-            bbox = self.draw.textbbox((0, 0), a, font=self.font)
-            self.bounds[a] = ( (bbox[2]-bbox[0])//2, (bbox[3]-bbox[1])//2 )
-        bbox = self.draw.textbbox((0, 0), '#', font=self.font)
-        self.bounds['#'] = ( (bbox[2]-bbox[0])//2, (bbox[3]-bbox[1])//2 )
-    
-    def point( self, x , y , a ):
-        w, h = self.bounds[a]
-        self.draw.text( (x-w, y-h), a, fill=self.black, font=self.font )
+        self.sprites = _glyph_sprites(14)
+
+    def point( self, x , y , a, fill=None ):
+        # stamp the pre-rendered glyph rather than laying out text
+        mask, w, h = self.sprites[a]
+        self.img.paste( self.black if fill is None else fill, (round(x-w), round(y-h)), mask )
         
-    def key_range( self, data ):
+    def key_range( self, sources ):
         self.sense = {}
-        sense_list = sorted(set( [t[1] for t in data] ))
+        sense_list = sorted(set( sources ))
         for i,k in enumerate(sense_list):
             if i < self.caps_len:
                 self.sense[k] = self.caps[i]
@@ -389,21 +496,114 @@ class BitMap:
         return ( self.Y1 - temp ) * (self.height-self.top_pad-self.bottom_pad) / ( self.Y1 - self.Y0 ) + self.top_pad
         
     def plot( self ):
+        if np is not None:
+            return self.plot_arrays()
         data = self.get_data()
-        self.key_range(data)
+        self.key_range( t[1] for t in data )
         self.y_limits(data)
         self.X0 = -24
         self.X1 = 0
-        self.horz()
-        self.vert()
+        self.background()
         self.legend()
+        if self.mode == "range":
+            cells = {}
+            last = {}
+            for d in data:
+                a = self.sense[d[1]]
+                col = min( int(self.X(d[0])), self.width-1 )
+                for y in d[2]:
+                    cell = cells.setdefault( (a, col), [y, y] )
+                    cell[0] = min( cell[0], y )
+                    cell[1] = max( cell[1], y )
+                    last[a] = ( d[0], y )
+            self.bars( [ (a, col, lo, hi) for (a, col), (lo, hi) in cells.items() ], last )
+            return self.img
         for d in data:
             a = self.sense[d[1]]
             for y in d[2]:
                 self.point( self.X(d[0]),self.Y(y),a)
         return self.img
 
+    def plot_arrays( self ):
+        # plot() with NumPy: the readings as arrays, every coordinate in one pass
+        codes, times, values = self.arrays( self.get_rows() )
+        self.y_limits(None, values)
+        self.X0 = -24
+        self.X1 = 0
+        self.background()
+        self.legend()
+        if self.mode == "range":
+            self.bars_arrays(codes, times, values)
+        else:
+            self.stamp(codes, times, values)
+        return self.img
+
+    def arrays( self, rows ):
+        # (letter index, hours, value) arrays with one entry per reading
+        _, times, sources, values = zip(*rows) if rows else ((), (), (), ())
+        self.key_range(sources)
+        self.letters = sorted(set(self.sense.values()))
+        index = { k: self.letters.index(a) for k, a in self.sense.items() }
+        codes = np.fromiter(map(index.__getitem__, sources), dtype=np.intp, count=len(sources))
+        return codes, np.array(times, dtype=float), np.array(values, dtype=float)
+
+    def stamp( self, codes, times, values ):
+        # all points at once: every glyph pixel of every marker set by array indexing
+        # same coordinates as point() (numpy rint and round() both round half to even)
+        canvas = np.array(self.img)     # bool [row, column]
+        xs = self.X(times)
+        ys = self.Y(values)
+        for i, a in enumerate(self.letters):
+            mask, w, h = self.sprites[a]
+            dy, dx = np.nonzero(np.array(mask))
+            chosen = codes == i
+            rows = (np.rint(ys[chosen] - h).astype(int)[:, None] + dy).ravel()
+            cols = (np.rint(xs[chosen] - w).astype(int)[:, None] + dx).ravel()
+            inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+            canvas[rows[inside], cols[inside]] = bool(self.black)
+        self.img = Image.fromarray(canvas)
+        self.draw = ImageDraw.Draw(self.img)
+
+    def bars_arrays( self, codes, times, values ):
+        # "range" mode with NumPy: min/max per (letter, column) by ufunc.at
+        cols = np.minimum( np.floor(self.X(times)).astype(int), self.width-1 )
+        cells = codes * self.width + cols
+        lo = np.full( len(self.letters) * self.width, np.inf )
+        hi = np.full( len(self.letters) * self.width, -np.inf )
+        np.minimum.at( lo, cells, values )
+        np.maximum.at( hi, cells, values )
+        filled = np.nonzero( np.isfinite(lo) )[0]
+        # rows are in time order: the last of each letter is its newest reading
+        latest = len(codes) - 1 - np.unique( codes[::-1], return_index=True )[1]
+        self.bars(
+            [ (self.letters[c // self.width], c % self.width, lo[c], hi[c]) for c in filled.tolist() ],
+            { self.letters[codes[i]]: ( times[i], values[i] ) for i in latest.tolist() } )
+
+    def bars( self, cells, last ):
+        # cells: (letter, column, min, max); last: letter -> newest (time, value),
+        # labelled with a reversed letter so each series can be told apart
+        for a, col, lo, hi in cells:
+            self.draw.line( [(col, float(self.Y(hi))), (col, float(self.Y(lo)))], fill=self.black, width=1 )
+        for a, (t, y) in sorted(last.items()):
+            mask, w, h = self.sprites[a]
+            x = min( float(self.X(t)), self.width - w - 2 )
+            y = float(self.Y(y))
+            ink = mask.getbbox() or (0, 0, 0, 0)
+            x0, y0 = round(x-w), round(y-h)
+            self.draw.rectangle( [x0+ink[0]-1, y0+ink[1]-1, x0+ink[2], y0+ink[3]], fill=self.black )
+            self.point( x, y, a, self.white )
+
     def y_minmax( self, ys ):
+        if np is not None and isinstance(ys, np.ndarray):
+            # already flat (see arrays)
+            if ys.size:
+                self.Y1 = round(float(ys.max()) + 1)
+                self.Y0 = round(float(ys.min()) - 1)
+                return
+            self.Y1 = 2
+            self.Y0 = 0
+            return
+
         # Flatten the dynamic tracking sub-lists cleanly using standard Python syntax
         flat_ys = [float(val) for sublist in ys for val in sublist if val is not None]
         
@@ -416,9 +616,9 @@ class BitMap:
         self.Y1 = 2
         self.Y0 = 0
 
-    def y_limits( self, data ):
+    def y_limits( self, data, values=None ):
         # Set Y1, Y0
-        self.y_minmax( [t[2] for t in data] )
+        self.y_minmax( [t[2] for t in data] if values is None else values )
         
         self.Ymajor = 1.0
         
@@ -440,6 +640,28 @@ class BitMap:
         self.Yminor = self.Ymajor / 10
         self.Y0 = math.floor(self.Y0 / self.Yminor) * self.Yminor
 
+    def background( self ):
+        # grid and axes from the template cache; only the data is drawn per request
+        # the minute so far, rounded down like plot_rows() and _frame_key(), so the
+        # grid matches the data and a template serves a minute of requests
+        self.now = math.floor( db.now_time() * 1440 ) / 1440
+        key = ( self.width, self.height, self.black, self.Y0, self.Y1, self.Ymajor, self.now )
+        with _template_lock:
+            template = _templates.get(key)
+            if template is not None:
+                _templates.move_to_end(key)
+        if template is None:
+            self.horz()
+            self.vert()
+            template = self.img.copy()
+            with _template_lock:
+                _templates[key] = template
+                while len(_templates) > _TEMPLATES:
+                    _templates.popitem(last=False)
+        else:
+            self.img = template.copy()
+            self.draw = ImageDraw.Draw(self.img)
+
     def horz(self):
         # horizontal lines, Y axis
         temp = self.Y0
@@ -459,7 +681,7 @@ class BitMap:
                 x = x_start + (temp % 7)
                 while x < x_end :
                     self.draw.line([(x, y), (x+3, y)], fill=self.black, width=1)
-                    x += random.randrange(8,11)
+                    x += _DASH_STEP
 
             temp += self.Yminor
             
@@ -468,7 +690,7 @@ class BitMap:
 
     def vert(self):
         # vertical lines, Y axis markings
-        now = db.now_time()
+        now = self.now
         marks = [
             ( 0., "N"),
             ( 4., "4p"),
@@ -486,7 +708,7 @@ class BitMap:
             y_end = self.Y(self.Y0)
             while y < y_end :
                 self.draw.line([(x, y), (x, y+3)], fill=self.black, width=1)
-                y += random.randrange(8,11)
+                y += _DASH_STEP
 
         for t in marks:
             rel = t[0]/24-now
@@ -498,24 +720,95 @@ class BitMap:
             self.draw.text((x, self.height-self.bottom_pad), t[1], font=self.axisfont, fill=self.black)
 
     def get_data( self ):
-        return [ ( t[0], t[1], list(map(float,self.NUM_REGEXP.findall(t[2]))) ) for t in db.plot_data() ]
+        # (hours before now, source, [numbers]) -- already typed by the database
+        return db.plot_data()
+
+    def get_rows( self ):
+        # (log_id, hours before now, source, number) -- one row per number
+        return db.plot_rows()
+
+class FrameCache:
+    """
+    LRU of finished /ePaper buffers and /test PNGs, keyed by
+    (format, width, height, data generation, minute). Concurrent requests
+    for the same key share one render: the first renders, the rest wait.
+    """
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._lock     = threading.Lock()
+        self._entries  = OrderedDict()   # key -> bytes
+        self._pending  = {}              # key -> Event set when its render ends
+        self.hits      = 0
+        self.misses    = 0
+        self.coalesced = 0
+
+    def get(self, key, render):
+        """Cached bytes for key, else render() them (once for all waiters)."""
+        if self.max_entries <= 0:
+            return render()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = threading.Event()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if pending is not None:
+            pending.wait()
+            with self._lock:
+                if key in self._entries:
+                    return self._entries[key]
+            # the render we waited for failed; try on our own
+            return render()
+        try:
+            frame = render()
+            with self._lock:
+                self._entries[key] = frame
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return frame
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+
+    def stats(self):
+        return {
+            "entries":   len(self._entries),
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "coalesced": self.coalesced,
+            "max_entries": self.max_entries,
+        }
+
+frames = FrameCache()   # replaced by init_app() with frame_cache from the TOML file
+
+def _frame_key(kind, width, height, mode):
+    # plot_data() is whole minutes, so a frame is good until the minute or the data changes
+    return (kind, width, height, mode, db.generation()[0], int(time.time() // 60))
 
 class BrowserBitMap(BitMap):
-    def __init__( self, width=800, height=480 ):
-        super().__init__( width=width, height=height, black=0, white=1 )
+    def __init__( self, width=800, height=480, mode="points" ):
+        super().__init__( width=width, height=height, black=0, white=1, mode=mode )
 
 class EPaperBitMap(BitMap):
-    def __init__( self, width=800, height=480 ):
-        super().__init__( width=width, height=height, black=1, white=0 )
+    def __init__( self, width=800, height=480, mode="points" ):
+        super().__init__( width=width, height=height, black=1, white=0, mode=mode )
 
 @app.route('/ePaper')
 @require_basic_auth
 def frame_buffer():
     width  = request.args.get( 'width',  800, type=int )
     height = request.args.get( 'height', 480, type=int )
-    bitmap = EPaperBitMap( width, height )
-    img = bitmap.plot()
-    raw_buffer = img.tobytes()
+    mode   = request.args.get( 'mode', 'points' )
+    if mode not in BitMap.MODES:
+        return Response('Bad Request: mode=points|range', status=400)
+    raw_buffer = frames.get(
+        _frame_key('raw', width, height, mode),
+        lambda: EPaperBitMap( width, height, mode ).plot().tobytes() )
     print(f"Raw Buffer size {len(raw_buffer)}")
     resp = Response(
         raw_buffer,
@@ -531,11 +824,14 @@ def frame_buffer():
 def frame_png():
     width  = request.args.get( 'width',  800, type=int )
     height = request.args.get( 'height', 480, type=int )
-    bitmap = BrowserBitMap( width, height )
-    img = bitmap.plot()
-    buf = BytesIO()
-    img.save(buf, format='PNG')
-    buf.seek(0)
+    mode   = request.args.get( 'mode', 'points' )
+    if mode not in BitMap.MODES:
+        return Response('Bad Request: mode=points|range', status=400)
+    def render():
+        buf = BytesIO()
+        BrowserBitMap( width, height, mode ).plot().save(buf, format='PNG')
+        return buf.getvalue()
+    buf = BytesIO(frames.get(_frame_key('png', width, height, mode), render))
     logging.debug("Sent PNG")
     return send_file(buf, mimetype='image/png')
 
@@ -543,50 +839,11 @@ def frame_png():
 # ---------------------------------------------------------------------------
 # Main page (GET /)
 # ---------------------------------------------------------------------------
+# The page is a fixed shell; owlogger.js reads ?date=&type=&points= from the
+# location and fetches its data from the JSON API below, so both the shell
+# and the data can be cached by the browser.
 
-@app.route('/')
-@require_basic_auth
-def index():
-    date_str      = request.args.get('date', dt.date.today().isoformat())
-    page_type_raw = request.args.get('type', 'data')
-    type_map      = {'week': 'week', 'plot': 'plot', 'stat': 'stat', 'month': 'month', }
-    page_type     = type_map.get(page_type_raw, 'data')
-
-    try:
-        daystart = dt.datetime.fromisoformat(date_str)
-    except ValueError:
-        daystart = dt.datetime.combine(dt.date.today(), dt.time())
-
-    logging.debug(f"GET / date={date_str} type={page_type}")
-
-    html = _make_html(daystart, page_type)
-    return Response(html, status=200, content_type='text/html')
-
-
-def _make_html(daystart, page_type):
-    # Data fetching
-    match page_type:
-        case 'week':
-            raw_data = db.week_data(daystart)
-        case 'month':
-            raw_data = db.month_data(daystart) 
-        case _:
-            raw_data = db.day_data(daystart)
-
-    # Use json.dumps to handle quotes, escaping, and formatting
-    now = dt.datetime.now()
-    js_vars = {
-        "dayData": raw_data,
-        "goodDays": [d[0] for d in db.distinct_days(daystart)],
-        "goodMonths": [f"{daystart.year}-{m[0]}-01" for m in db.distinct_months(daystart)],
-        "goodYears": [f"{y[0]}-01-01" for y in db.distinct_years()],
-        "daystart": daystart.isoformat(),
-        "page_type": page_type,
-        "header_date": now.strftime('%m/%d/%Y'),
-        "header_time": now.strftime('%H:%M'),
-    }
-
-    return f"""
+_SHELL_HTML = """
 <!DOCTYPE html>
 <html lang="en">
     <head>
@@ -610,12 +867,15 @@ def _make_html(daystart, page_type):
                 <a class="button" id="plot"  href="#" onclick="JumpTo.type('plot')">Graph</a>
                 <a class="button" id="week"  href="#" onclick="JumpTo.type('week')">Week</a>
                 <a class="button" id="month" href="#" onclick="JumpTo.type('month')">Month</a>
+                <a class="button" id="year"  href="#" onclick="JumpTo.type('year')">Year</a>
                 <span id="date"></span>
                 <span id="time"></span>
             </div>
             <div id="datebar" onclick="globalThis.dp.show()">
                 <button id='Ucal'>&#128467;</button>
                 <input id='new_cal' type="text" size="10" readonly hidden>&nbsp;<span id="showdate"></span>
+                <span id="alerts"></span>
+                <input id="search" type="search" placeholder="Search" hidden onclick="event.stopPropagation()">
             </div>
             <div id='contentarea'>
                 <div class="non-plot">
@@ -635,13 +895,375 @@ def _make_html(daystart, page_type):
            </div>
         </div>
     </body>
-    <script>
-        // Injecting the full config as a single JSON object is much safer
-        var globals = {json.dumps(js_vars)};
-        // Convert the date string back to a JS Date object
-        globals.daystart = new Date(globals.daystart);
-    </script>
 </html>"""
+_SHELL_ETAG = hashlib.sha1(_SHELL_HTML.encode()).hexdigest()
+
+@app.route('/')
+@require_basic_auth
+def index():
+    if request.if_none_match.contains(_SHELL_ETAG):
+        response = Response(status=304)
+    else:
+        response = Response(_SHELL_HTML, status=200, content_type='text/html')
+    response.set_etag(_SHELL_ETAG)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# ---------------------------------------------------------------------------
+# JSON data API (GET /api/day|week|month|year, /api/days)
+# ---------------------------------------------------------------------------
+# Responses carry a strong ETag from the request and the generation counter
+# (see QueryCache), so a matching If-None-Match is answered with 304 before
+# any data table is read. Windows that ended before today only depend on the
+# "past" counter and may be kept by the browser for a day.
+
+_PAST_MAX_AGE = 86400   # seconds
+
+_SPAN_DAYS = {'day': 0, 'week': 6, 'month': 30, 'year': 365}    # days before ?date=
+
+def _page_data(daystart, page_type, points=None, span='day'):
+    # Plots get numbers already parsed: [t, source, [values]]
+    # Longer spans come from the rollup tables, one point per hour or day
+    # points= thins each source of a plot to that many samples (LTTB)
+    # Stats are summed on the server from the daily rollups, for any span
+    match page_type:
+        case 'stat':
+            raw_data = _summarize_stats(db.stats(daystart, _SPAN_DAYS[span]))
+        case 'week':
+            raw_data = db.back_rollup(daystart, 6)
+        case 'month':
+            raw_data = db.back_rollup(daystart, 30)
+        case 'year':
+            raw_data = db.back_rollup_days(daystart, 365)
+        case 'plot':
+            raw_data = db.day_readings(daystart)
+        case _:
+            raw_data = db.day_data(daystart)
+    if page_type in ('plot', 'week', 'month', 'year'):
+        raw_data = _downsample(raw_data, points)
+    return raw_data
+
+
+def _api_date():
+    """?date=YYYY-MM-DD as a naive local datetime, today if absent or invalid."""
+    date_str = request.args.get('date', dt.date.today().isoformat())
+    try:
+        return dt.datetime.fromisoformat(date_str)
+    except ValueError:
+        return dt.datetime.combine(dt.date.today(), dt.time())
+
+
+def _conditional_json(key, past, build):
+    """
+    JSON response of build() with a strong ETag from `key` and the data
+    generation; past=True when the window ended before today.
+    """
+    live, past_generation = db.generation()
+    etag = hashlib.sha1(repr((key, past_generation if past else live)).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(json.dumps(build()), status=200, content_type='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={_PAST_MAX_AGE}' if past else 'private, no-cache'
+    return response
+
+
+@app.route('/api/day')
+@app.route('/api/week')
+@app.route('/api/month')
+@app.route('/api/year')
+@require_basic_auth
+def data_json():
+    """
+    Page data for one span ending at ?date=; /api/day takes ?type=data|plot|stat,
+    the longer spans ?type=stat for statistics instead of the plot.
+    """
+    span      = request.path.rsplit('/', 1)[1]
+    page_type = request.args.get('type', 'data')
+    if span == 'day':
+        if page_type not in ('data', 'plot', 'stat'):
+            page_type = 'data'
+    elif page_type != 'stat':
+        page_type = span
+    daystart = _api_date()
+    points   = _points_arg()
+    past     = _cache_class(_local_day_span(daystart)[1]) == "past"
+
+    logging.debug(f"GET {request.path} date={daystart.date()} type={page_type} points={points}")
+
+    return _conditional_json(
+        (span, page_type, daystart.isoformat(), points), past,
+        lambda: {
+            "dayData": _page_data(daystart, page_type, points, span),
+            "daystart": daystart.isoformat(),
+            "page_type": page_type,
+            "span": span,
+        })
+
+
+_SERIES_UNITS       = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_SERIES_MAX_BUCKETS = 50000    # per series, keeps one response bounded
+
+@app.route('/api/series')
+@require_basic_auth
+def series_json():
+    """
+    Bucketed readings: ?source=(repeatable, default all)&from=&to=
+    (local YYYY-MM-DD, inclusive)&bucket=5m|1h|1d|...&agg=min|max|avg|last|count
+    Columnar: one {source, channel, t: [bucket start], v: [value]} per series.
+    """
+    try:
+        today = dt.date.today()
+        first = dt.date.fromisoformat(request.args.get('from', today.isoformat()))
+        last  = dt.date.fromisoformat(request.args.get('to', first.isoformat()))
+    except ValueError:
+        return Response('Bad Request: from/to=YYYY-MM-DD', status=400)
+    if last < first:
+        return Response('Bad Request: to before from', status=400)
+    bucket_str = request.args.get('bucket', '1h')
+    match = re.fullmatch(r"(\d+)([smhd])", bucket_str)
+    bucket = int(match[1]) * _SERIES_UNITS[match[2]] if match else 0
+    if bucket <= 0:
+        return Response('Bad Request: bucket=<n>s|m|h|d', status=400)
+    if ((last - first).days + 1) * 86400 / bucket > _SERIES_MAX_BUCKETS:
+        return Response(f'Bad Request: more than {_SERIES_MAX_BUCKETS} buckets', status=400)
+    agg = request.args.get('agg', 'avg')
+    if agg not in Database.SERIES_AGGS:
+        return Response(f'Bad Request: agg={"|".join(Database.SERIES_AGGS)}', status=400)
+    sources = request.args.getlist('source')
+    past    = _cache_class(_local_day_span(last)[1]) == "past"
+
+    logging.debug(f"GET /api/series {first}..{last} bucket={bucket} agg={agg} sources={sources}")
+
+    return _conditional_json(
+        ('series', first.isoformat(), last.isoformat(), bucket, agg, tuple(sources)), past,
+        lambda: {
+            "from": first.isoformat(),
+            "to": last.isoformat(),
+            "bucket": bucket,
+            "agg": agg,
+            "series": [
+                {"source": source, "channel": channel, "t": t, "v": v}
+                for source, channel, t, v in db.series(first, last, bucket, agg, sources)
+            ],
+        })
+
+
+@app.route('/api/days')
+@require_basic_auth
+def days_json():
+    """Days, months and years with data around ?date=, for the date picker."""
+    daystart = _api_date()
+    return _conditional_json(
+        ('days', daystart.date().isoformat(), db.search_enabled), False,
+        lambda: {
+            "search": db.search_enabled,
+            "goodDays": [d[0] for d in db.distinct_days(daystart)],
+            "goodMonths": [f"{daystart.year}-{m[0]}-01" for m in db.distinct_months(daystart)],
+            "goodYears": [f"{y[0]}-01-01" for y in db.distinct_years()],
+        })
+
+
+def _fts_query(text, sources):
+    """
+    Search box text -> FTS5 query: every word must match, "word*" is a prefix.
+    The index holds source ids, so a word matches a source through the ids of
+    the (id, name) `sources` whose name has that word (tokenised like FTS5).
+    """
+    names = [ (source_id, re.findall(r"[^\W_]+", name.lower())) for source_id, name in sources ]
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if not word:
+            continue
+        term = "value : " + '"' + word.replace('"', '""') + '"' + ("*" if prefix else "")
+        low = word.lower()
+        ids = [ f'"{source_id}"' for source_id, tokens in names
+                if any(t.startswith(low) if prefix else t == low for t in tokens) ]
+        if ids:
+            term = f"({term} OR source : ({' OR '.join(ids)}))"
+        terms.append(term)
+    # explicit AND: FTS5 does not accept implicit AND after a bracketed group
+    return " AND ".join(terms)
+
+
+@app.route('/api/search')
+@require_basic_auth
+def search_json():
+    """
+    Full-text search of logged values and sources (search = true in the
+    TOML file): ?q=words&limit=50&before=<"next" from the previous page>
+    """
+    if not db.search_enabled:
+        return Response('Search is not enabled', status=404)
+    query = _fts_query(request.args.get('q', ''), db.sources())
+    if not query:
+        return Response('Bad Request: q=words', status=400)
+    limit  = max(1, min(request.args.get('limit', 50, type=int), 500))
+    before = None
+    if 'before' in request.args:
+        date, _, log_id = request.args['before'].rpartition('|')
+        if not date or not log_id.isdigit():
+            return Response('Bad Request: before', status=400)
+        before = (date, int(log_id))
+    rows = db.search(query, limit, before)
+    body = {
+        "rows": [ [local, source, value] for date, log_id, local, source, value in rows ],
+        "next": f"{rows[-1][0]}|{rows[-1][1]}" if len(rows) == limit else None,
+    }
+    return Response(json.dumps(body), status=200, content_type='application/json')
+
+
+@app.route('/api/status')
+@require_basic_auth
+def status_json():
+    """
+    Latest reading per source from source_state (no datalog scan).
+    Sources quiet for longer than ?silence= seconds (default silence_minutes
+    from the TOML file) are flagged and listed under "silent".
+    """
+    threshold = request.args.get('silence', silence, type=int)
+    db.check_alerts()
+    now = int(time.time())
+    sources = [
+        {
+            "source": source,
+            "last_ts": last_ts,
+            "last_value": last_value,
+            "count_today": count_today,
+            "age": now - last_ts,
+            "silent": now - last_ts > threshold,
+        }
+        for source, last_ts, last_value, count_today in db.source_state()
+    ]
+    body = {
+        "now": now,
+        "silence": threshold,
+        "sources": sources,
+        "silent": [s["source"] for s in sources if s["silent"]],
+    }
+    return Response(json.dumps(body), status=200, content_type='application/json',
+                    headers={'Cache-Control': 'no-store'})
+
+
+@app.route('/api/alerts')
+@require_basic_auth
+def alerts_json():
+    """Rules currently firing and the latest ?limit= alert events."""
+    db.check_alerts()
+    limit = max(1, min(request.args.get('limit', 50, type=int), 1000))
+    rules = {rule.name: rule for rule in db.alerts.rules} if db.alerts else {}
+    body = {
+        "firing": [
+            {"rule": name, "since": since, "message": rules[name].describe()}
+            for name, since in db.alert_firing() if name in rules
+        ],
+        "events": [
+            dict(zip(("ts", "rule", "source", "event", "value", "message"), row))
+            for row in db.alert_events(limit)
+        ],
+    }
+    return Response(json.dumps(body), status=200, content_type='application/json',
+                    headers={'Cache-Control': 'no-store'})
+
+
+@app.route('/api/cache')
+@require_basic_auth
+def cache_status():
+    return Response(json.dumps({**db.cache.stats(), "frames": frames.stats()}),
+                    status=200, content_type='application/json')
+
+
+@app.route('/api/calendar')
+@require_basic_auth
+def calendar_json():
+    """Days with data in one month (?month=YYYY-MM), for the date picker."""
+    try:
+        month = dt.datetime.strptime(request.args.get('month', dt.date.today().strftime('%Y-%m')), '%Y-%m')
+    except ValueError:
+        return Response('Bad Request: month=YYYY-MM', status=400)
+    days = [
+        {"date": d, "count": count, "first": first, "last": last}
+        for d, count, first, last in db.calendar_month(month.year, month.month)
+    ]
+    body = {"month": month.strftime('%Y-%m'), "days": days}
+    return Response(json.dumps(body), status=200, content_type='application/json')
+
+# ---------------------------------------------------------------------------
+# Export (GET /api/export)
+# ---------------------------------------------------------------------------
+# ?from=YYYY-MM-DD&to=YYYY-MM-DD (local days, inclusive, default today)
+# &source=name (optional) &format=csv|ndjson (default csv)
+# Streamed as it is read; gzip-encoded when the client accepts it.
+# With partition files each file numbers its rows from 1, so a row is
+# identified by (partition, id); partition is "" for the main file.
+
+_EXPORT_COLUMNS = ("partition", "id", "utc", "local", "source", "value")
+_EXPORT_FLUSH   = 64 * 1024     # characters of output per chunk sent
+
+def _export_chunks(rows, form):
+    """Encode export rows as CSV (with header) or NDJSON, ~_EXPORT_FLUSH chars at a time."""
+    buf = StringIO()
+    if form == "csv":
+        writer = csv.writer(buf)
+        writer.writerow(_EXPORT_COLUMNS)
+    for row in rows:
+        if form == "csv":
+            writer.writerow(row)
+        else:
+            buf.write(json.dumps(dict(zip(_EXPORT_COLUMNS, row))) + "\n")
+        if buf.tell() >= _EXPORT_FLUSH:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _export_stream(chunks, compress):
+    """UTF-8 encode the chunks, through a streaming gzip encoder if asked."""
+    gz = zlib.compressobj(wbits=31) if compress else None   # 31: gzip wrapper
+    for chunk in chunks:
+        data = chunk.encode()
+        data = gz.compress(data) if gz else data
+        if data:
+            yield data
+    if gz:
+        yield gz.flush()
+
+
+@app.route('/api/export')
+@require_basic_auth
+def export_data():
+    try:
+        today = dt.date.today()
+        first = dt.date.fromisoformat(request.args.get('from', today.isoformat()))
+        last  = dt.date.fromisoformat(request.args.get('to', first.isoformat()))
+    except ValueError:
+        return Response('Bad Request: from/to=YYYY-MM-DD', status=400)
+    if last < first:
+        return Response('Bad Request: to before from', status=400)
+    form = request.args.get('format', 'csv')
+    if form not in ('csv', 'ndjson'):
+        return Response('Bad Request: format=csv|ndjson', status=400)
+    source   = request.args.get('source')
+    compress = 'gzip' in request.accept_encodings
+
+    logging.debug(f"GET /api/export {first}..{last} source={source} format={form} gzip={compress}")
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="owlogger-{first}-{last}.{form}"',
+        'Cache-Control': 'private, no-store',
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    return Response(
+        _export_stream(_export_chunks(db.export_rows(first, last, source), form), compress),
+        status=200,
+        content_type='text/csv; charset=utf-8' if form == 'csv' else 'application/x-ndjson',
+        headers=headers)
 
 @app.after_request
 def apply_global_security_headers(response):
@@ -661,31 +1283,827 @@ def receive_data():
     body = request.get_json(force=True)
     if body:
         logging.debug(f"POST {body}")
-        name = body.get('name', 'unknown')
+        # stored as text, like /bulk: {"data": 21.5} is logged as '21.5'
+        name = str(body.get('name', 'unknown'))
         data = body.get('data', '')
         if data:
-            db.add(name, data)
+            data = str(data)
+            if write_behind is None:
+                db.add(name, data)
+            elif not write_behind.put(name, data):
+                return Response('Ingest queue full', status=503, headers={'Retry-After': '5'})
         return Response('', status=200, content_type='text/html')
     else:
         return Response('Bad Request', status=400)
 
 
+_BULK_MAX = 10000   # readings per /bulk request
+
+
+def _bulk_items(raw):
+    """JSON array, or NDJSON (one object per line), into a list of items."""
+    text = raw.decode('utf-8').strip()
+    if text.startswith('['):
+        items = json.loads(text)
+        if not isinstance(items, list):
+            raise ValueError("expected a JSON array")
+        return items
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _bulk_time(stamp):
+    """Optional item timestamp: unix seconds or ISO 8601 (UTC unless offset given)."""
+    if stamp is None:
+        return None
+    if isinstance(stamp, (int, float)) and not isinstance(stamp, bool):
+        return dt.datetime.fromtimestamp(stamp, dt.timezone.utc)
+    moment = dt.datetime.fromisoformat(str(stamp))
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=dt.timezone.utc)
+    return moment.astimezone(dt.timezone.utc)
+
+
+@app.route('/bulk', methods=['POST', 'PUT'])
+@require_jwt
+def receive_bulk():
+    """
+    Many readings in one request, e.g. catch-up after a network outage.
+    Items: {"name": source, "data": text, "time": optional timestamp}
+    All valid items are stored in a single transaction; the reply lists
+    a status for each item in order.
+    """
+    try:
+        items = _bulk_items(request.get_data())
+    except (ValueError, UnicodeDecodeError) as e:
+        return Response(f'Bad Request: {e}', status=400)
+    if len(items) > _BULK_MAX:
+        return Response(f'Too many items (max {_BULK_MAX})', status=413)
+
+    rows    = []
+    results = []
+    for item in items:
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("item is not an object")
+            data = item.get('data', '')
+            if not data:
+                raise ValueError("missing data")
+            rows.append((str(item.get('name', 'unknown')), str(data), _bulk_time(item.get('time'))))
+            results.append({"status": "ok"})
+        except (ValueError, TypeError, OverflowError, OSError) as e:
+            results.append({"status": "error", "error": str(e)})
+
+    if rows:
+        try:
+            db.add_many(rows)
+        except sqlite3.Error:
+            return Response('Database error', status=500)
+    logging.debug(f"BULK {len(rows)} of {len(items)} readings stored")
+    body = {"stored": len(rows), "rejected": len(items) - len(rows), "items": results}
+    return Response(json.dumps(body), status=200, content_type='application/json')
+
+
+@app.route('/api/ingest')
+@require_basic_auth
+def ingest_status():
+    stats = write_behind.stats() if write_behind else {"write_behind": False}
+    return Response(json.dumps(stats), status=200, content_type='application/json')
+
+
+class WriteBehind:
+    """
+    Group-commit queue for POST/PUT samples.
+
+    Requests are acknowledged once queued; a single writer thread per
+    process drains the queue into Database.add_many(), committing when
+    batch_size rows are waiting or batch_delay seconds have passed since
+    the first one arrived. The arrival time is kept as the row timestamp.
+    """
+    BATCH_SIZE  = 100
+    BATCH_DELAY = 0.5     # seconds
+    QUEUE_SIZE  = 10000   # samples; put() fails beyond this
+
+    _STOP = object()
+
+    def __init__(self, database, batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY, queue_size=QUEUE_SIZE):
+        self.database    = database
+        self.batch_size  = max(1, int(batch_size))
+        self.batch_delay = float(batch_delay)
+        self.queue_size  = int(queue_size)
+        self._pid        = None
+        self._start_lock = threading.Lock()
+
+    def _start(self):
+        # Threads don't survive fork: each gunicorn worker gets its own
+        # queue and writer thread on first use.
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue     = queue.Queue(maxsize=self.queue_size)
+            self.committed  = 0
+            self.batches    = 0
+            self.rejected   = 0
+            self.failed     = 0
+            self.last_ms    = 0.0
+            self.max_ms     = 0.0
+            self.total_ms   = 0.0
+            self._thread    = threading.Thread(target=self._run, name="owlogger-writer", daemon=True)
+            self._pid       = os.getpid()
+            self._thread.start()
+
+    def put(self, source, value):
+        """Queue one sample; False if the queue is full."""
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            # text, as stored by add(); anything else would fail in the writer thread
+            self._queue.put_nowait((str(source), str(value), dt.datetime.now(dt.timezone.utc)))
+            return True
+        except queue.Full:
+            self.rejected += 1
+            logging.warning("Write-behind queue full, sample rejected")
+            return False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            batch    = [item]
+            deadline = time.monotonic() + self.batch_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        start = time.perf_counter()
+        if not self._add(batch):
+            if len(batch) > 1:
+                # one row at a time, so only the bad sample is lost
+                for row in batch:
+                    self._commit([row])
+            else:
+                self.failed += 1
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        self.committed += len(batch)
+        self.batches   += 1
+        self.last_ms    = elapsed
+        self.max_ms     = max(self.max_ms, elapsed)
+        self.total_ms  += elapsed
+        logging.debug(f"Write-behind committed {len(batch)} rows in {elapsed:.1f} ms")
+
+    def _add(self, batch):
+        # False if add_many() raised: nothing may stop the writer thread
+        try:
+            self.database.add_many(batch)
+            return True
+        except sqlite3.Error:
+            return False    # already logged by Database
+        except Exception:
+            logging.exception(f"Write-behind batch of {len(batch)} rows failed")
+            return False
+
+    def close(self):
+        """Commit everything still queued and stop the writer thread."""
+        if self._pid != os.getpid():
+            return
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._pid = None
+
+    def stats(self):
+        if self._pid != os.getpid():
+            self._start()
+        return {
+            "write_behind": True,
+            "queue_depth":  self._queue.qsize(),
+            "queue_size":   self.queue_size,
+            "committed":    self.committed,
+            "batches":      self.batches,
+            "rejected":     self.rejected,
+            "failed":       self.failed,
+            "commit_ms_last": round(self.last_ms, 3),
+            "commit_ms_avg":  round(self.total_ms / self.batches, 3) if self.batches else 0.0,
+            "commit_ms_max":  round(self.max_ms, 3),
+        }
+
+
+# ---------------------------------------------------------------------------
+# Alert rules
+# ---------------------------------------------------------------------------
+# [[alert]] tables in the TOML file, e.g.
+#
+#   [[alert]]                       [[alert]]
+#   name = "freezer warm"           name = "basement quiet"
+#   source = "freezer"              source = "basement"
+#   above = -10                     silent_minutes = 120
+#   for_minutes = 15
+#   channel = 0                     # optional, number in the value (default 0)
+#   command = "notify-send ..."     # optional, run with OWLOGGER_ALERT_* env
+#   webhook = "https://..."         # optional, event POSTed as JSON
+#
+# Rule state lives in the alert_state table and changes inside the ingest
+# transaction, so every gunicorn worker sees the same state machine:
+#   threshold:  ok -> pending (breached) -> firing (for_minutes) -> ok
+#   silence:    ok -> firing (no data for silent_minutes) -> ok (data)
+# Silence can't be noticed by a sample that never comes, so it is checked at
+# most every CHECK_INTERVAL seconds, piggybacked on ingest and on polls of
+# /api/status and /api/alerts.
+
+class AlertRule:
+    def __init__(self, spec):
+        try:
+            self.name   = str(spec["name"])
+            self.source = str(spec["source"])
+        except KeyError as e:
+            raise ValueError(f"alert rule needs {e.args[0]!r}: {spec!r}")
+        self.channel        = int(spec.get("channel", 0))
+        self.above          = spec.get("above")
+        self.below          = spec.get("below")
+        self.for_seconds    = int(spec.get("for_minutes", 0) * 60)
+        self.silent_seconds = int(spec.get("silent_minutes", 0) * 60)
+        self.command        = spec.get("command")
+        self.webhook        = spec.get("webhook")
+        threshold = self.above is not None or self.below is not None
+        if threshold == bool(self.silent_seconds):
+            raise ValueError(f"alert {self.name!r} needs above/below or silent_minutes (not both)")
+
+    def breached(self, value):
+        return ((self.above is not None and value > self.above)
+                or (self.below is not None and value < self.below))
+
+    def describe(self):
+        if self.silent_seconds:
+            return f"no data from {self.source} for {self.silent_seconds // 60} min"
+        limits = " and ".join(
+            f"{word} {limit}" for word, limit in (("above", self.above), ("below", self.below))
+            if limit is not None)
+        held = f" for {self.for_seconds // 60} min" if self.for_seconds else ""
+        return f"{self.source}[{self.channel}] {limits}{held}"
+
+
+class Alerts:
+    """
+    Incremental evaluation of AlertRules: each ingested sample only touches
+    the rules for its source (and their alert_state rows).
+    """
+    CHECK_INTERVAL = 60     # seconds between silence checks per process
+    HOOK_TIMEOUT   = 30     # seconds for a command or webhook
+
+    def __init__(self, specs):
+        self.rules = [AlertRule(spec) for spec in specs]
+        names = [rule.name for rule in self.rules]
+        if len(names) != len(set(names)):
+            raise ValueError("alert rule names must be unique")
+        self.by_source = {}
+        for rule in self.rules:
+            self.by_source.setdefault(rule.source, []).append(rule)
+        self.silence_rules = [rule for rule in self.rules if rule.silent_seconds]
+        self._checked = 0
+
+    @staticmethod
+    def _state(conn, rule):
+        row = conn.execute(
+            """SELECT state, since, updated FROM alert_state WHERE rule = ?""", (rule.name,)).fetchone()
+        return row or ("ok", None, 0)
+
+    @staticmethod
+    def _set_state(conn, rule, state, since, updated):
+        conn.execute(
+            """INSERT INTO alert_state(rule, state, since, updated) VALUES (?,?,?,?)
+               ON CONFLICT(rule) DO UPDATE SET
+                   state = excluded.state, since = excluded.since, updated = excluded.updated""",
+            (rule.name, state, since, updated))
+
+    @staticmethod
+    def _event(conn, rule, ts, event, value):
+        message = f"{rule.name} {event}: {rule.describe()}"
+        conn.execute(
+            """INSERT INTO alerts(ts, rule, source, event, value, message) VALUES (?,?,?,?,?,?)""",
+            (ts, rule.name, rule.source, event, value, message))
+        logging.warning(f"Alert {message} (value {value})")
+        return rule, {"ts": ts, "rule": rule.name, "source": rule.source,
+                      "event": event, "value": value, "message": message}
+
+    def ingest(self, conn, rows):
+        """Step the rules of each (source, value, moment) row; returns events."""
+        events = []
+        matched = sorted(
+            (int(moment.timestamp()), source, value)
+            for source, value, moment in rows if source in self.by_source)
+        for ts, source, value in matched:
+            numbers = None
+            for rule in self.by_source[source]:
+                state, since, updated = self._state(conn, rule)
+                if ts < updated:
+                    # back-dated sample, the rule has moved past it
+                    continue
+                if rule.silent_seconds:
+                    if state == "firing":
+                        events.append(self._event(conn, rule, ts, "cleared", value))
+                    self._set_state(conn, rule, "ok", None, ts)
+                    continue
+                if numbers is None:
+                    numbers = _parse_numbers(value)
+                if rule.channel >= len(numbers):
+                    continue
+                number = numbers[rule.channel]
+                if not rule.breached(number):
+                    if state == "firing":
+                        events.append(self._event(conn, rule, ts, "cleared", str(number)))
+                    state, since = "ok", None
+                else:
+                    if state == "ok":
+                        state, since = "pending", ts
+                    if state == "pending" and ts - since >= rule.for_seconds:
+                        state = "firing"
+                        events.append(self._event(conn, rule, ts, "fired", str(number)))
+                self._set_state(conn, rule, state, since, ts)
+        return events
+
+    def due(self):
+        """True once per CHECK_INTERVAL, when silence should be checked."""
+        now = time.monotonic()
+        if not self.silence_rules or now - self._checked < self.CHECK_INTERVAL:
+            return False
+        self._checked = now
+        return True
+
+    def check_silence(self, conn, now):
+        """Fire silence rules whose source has been quiet too long; returns events."""
+        events = []
+        for rule in self.silence_rules:
+            state, since, updated = self._state(conn, rule)
+            if state == "firing":
+                continue
+            row = conn.execute(
+                """SELECT last_ts FROM source_state WHERE source = ?""", (rule.source,)).fetchone()
+            # a source never seen counts from the rule's first check
+            last_ts = row[0] if row else (updated or now)
+            if now - last_ts > rule.silent_seconds:
+                events.append(self._event(conn, rule, now, "fired", None))
+                self._set_state(conn, rule, "firing", now, last_ts)
+            elif row is None and not updated:
+                self._set_state(conn, rule, "ok", None, now)
+        return events
+
+    def notify(self, events):
+        """Run command/webhook hooks for committed events, off the request thread."""
+        hooked = [ (rule, event) for rule, event in events if rule.command or rule.webhook ]
+        if hooked:
+            threading.Thread(target=self._run_hooks, args=(hooked,), daemon=True).start()
+
+    def _run_hooks(self, events):
+        for rule, event in events:
+            if rule.command:
+                env = dict(os.environ, **{ f"OWLOGGER_ALERT_{k.upper()}": str(v) for k, v in event.items() })
+                try:
+                    subprocess.run(rule.command, shell=True, env=env, timeout=self.HOOK_TIMEOUT)
+                except (OSError, subprocess.SubprocessError) as e:
+                    logging.error(f"Alert command for {rule.name!r} failed: {e}")
+            if rule.webhook:
+                req = urllib.request.Request(
+                    rule.webhook, data=json.dumps(event).encode(),
+                    headers={"Content-Type": "application/json"}, method="POST")
+                try:
+                    urllib.request.urlopen(req, timeout=self.HOOK_TIMEOUT).close()
+                except (OSError, ValueError) as e:
+                    logging.error(f"Alert webhook for {rule.name!r} failed: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Reading helpers
+# ---------------------------------------------------------------------------
+# Numbers are pulled out of the free-text value once, at ingest, and kept in
+# the readings table (one row per number, channel = position in the text).
+
+_NUM_REGEXP = re.compile(r"-?\d+\.?\d*|-?\.\d+")
+
+
+def _parse_numbers(value):
+    """All numbers in a logged value string (or bare number), as floats."""
+    if value is None:
+        return []
+    return [float(n) for n in _NUM_REGEXP.findall(str(value))]
+
+
+def _group_readings(rows):
+    """
+    Fold (key, t, source, value) rows back into one [t, source, [values]]
+    entry per logged line (key = log_id) or rollup bucket (key = bucket).
+    Rows must be ordered so each (key, source) group is contiguous.
+    """
+    grouped = []
+    last = None
+    for key, t, source, value in rows:
+        if (key, source) != last:
+            grouped.append([t, source, []])
+            last = (key, source)
+        grouped[-1][2].append(value)
+    return grouped
+
+
+def _plot_x(t):
+    """Plot x of a grouped row: days as float, or local "HH:MM:SS" as seconds."""
+    if isinstance(t, str):
+        h, m, s = (int(n) for n in t.split(":"))
+        return h * 3600 + m * 60 + s
+    return t
+
+
+def _lttb(xs, ys, points):
+    """
+    Largest-Triangle-Three-Buckets: indexes of `points` samples that keep
+    the visual shape of the series. ys holds one tuple of channels per x;
+    a triangle's area is summed over the channels.
+    """
+    n = len(xs)
+    if n <= points:
+        return list(range(n))
+    every = (n - 2) / (points - 2)
+    channels = range(min(len(y) for y in ys))
+    picked = [0]
+    a = 0
+    for i in range(points - 2):
+        # average of the next bucket is the third corner
+        lo, hi = int((i + 1) * every) + 1, min(int((i + 2) * every) + 1, n)
+        cx = sum(xs[lo:hi]) / (hi - lo)
+        cy = [sum(y[c] for y in ys[lo:hi]) / (hi - lo) for c in channels]
+        ax, ay = xs[a], ys[a]
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = sum(
+                abs((ax - cx) * (ys[j][c] - ay[c]) - (ax - xs[j]) * (cy[c] - ay[c]))
+                for c in channels)
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+    picked.append(n - 1)
+    return picked
+
+
+def _downsample(rows, points):
+    """
+    Thin grouped [t, source, [values]] rows to at most `points` per source
+    with LTTB. Row order is kept, so the result reads like the input.
+    """
+    if not points:
+        return rows
+    by_source = {}
+    for i, row in enumerate(rows):
+        by_source.setdefault(row[1], []).append(i)
+    keep = set()
+    for index in by_source.values():
+        xs = [_plot_x(rows[i][0]) for i in index]
+        ys = [tuple(rows[i][2]) for i in index]
+        keep.update(index[j] for j in _lttb(xs, ys, points))
+    return [row for i, row in enumerate(rows) if i in keep]
+
+
+def _summary(readings, low, high, total, squares):
+    """Count, mean, population std dev and range from running sums."""
+    if not readings:
+        return {"readings": 0}
+    avg = total / readings
+    return {
+        "readings": readings,
+        "avg": avg,
+        "std": math.sqrt(max(0.0, squares / readings - avg * avg)),
+        "min": low,
+        "max": high,
+    }
+
+
+def _summarize_stats(rows):
+    """
+    Stats page table from Database.stats() rows: one entry per source with
+    its channels, then the pooled "All" entry (source null). Lines are the
+    logged lines with at least one number (channel 0 count).
+    """
+    def pooled(accs):
+        accs = list(accs)
+        return (
+            sum(a[0] for a in accs),
+            min((a[1] for a in accs), default=None),
+            max((a[2] for a in accs), default=None),
+            sum(a[3] for a in accs),
+            sum(a[4] for a in accs),
+        )
+    sources = {}
+    for source, channel, *acc in rows:
+        sources.setdefault(source, {})[channel] = acc
+    table = []
+    for source, channels in sources.items():
+        entry = {"source": source, "lines": channels.get(0, [0])[0]}
+        entry.update(_summary(*pooled(channels.values())))
+        entry["channels"] = [
+            dict(_summary(*acc), channel=channel) for channel, acc in channels.items() ]
+        table.append(entry)
+    everything = {"source": None, "lines": sum(e["lines"] for e in table)}
+    everything.update(_summary(*pooled(acc for c in sources.values() for acc in c.values())))
+    everything["channels"] = []
+    table.append(everything)
+    return table
+
+
+def _points_arg():
+    """Optional ?points= budget for plot data; None (no thinning) if absent or < 3."""
+    points = request.args.get('points', type=int)
+    return points if points is not None and points >= 3 else None
+
+
+# ---------------------------------------------------------------------------
+# Time helpers
+# ---------------------------------------------------------------------------
+# datalog.date holds UTC text ("YYYY-MM-DD HH:MM:SS") from CURRENT_TIMESTAMP.
+# Local-day windows are converted to UTC bounds here so queries compare the
+# bare column and SQLite can range-scan idx_date.
+
+def _local_midnight_utc(day):
+    """Local midnight at the start of `day` (date or datetime), as UTC."""
+    if isinstance(day, dt.datetime):
+        day = day.date()
+    # astimezone() on a naive value applies the system zone, DST included
+    return dt.datetime.combine(day, dt.time()).astimezone().astimezone(dt.timezone.utc)
+
+
+def _sql_time(moment):
+    """UTC datetime -> datalog.date text."""
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _local_day_span(day, days=1):
+    """Half-open UTC datetimes [start, end) covering `days` local days."""
+    if isinstance(day, dt.datetime):
+        day = day.date()
+    return _local_midnight_utc(day), _local_midnight_utc(day + dt.timedelta(days=days))
+
+
 # ---------------------------------------------------------------------------
 # Database class
 # ---------------------------------------------------------------------------
 
+def _cache_class(end):
+    """
+    Result cache class for a query window ending at UTC datetime `end`:
+    "past" if it ended before today (local), else "live".
+    """
+    return "past" if end <= _local_midnight_utc(dt.date.today()) else "live"
+
+
+class QueryCache:
+    """
+    LRU of fetch() results, bounded by entry count and total rows.
+
+    Entries are stamped from the generation table, which add_many() bumps
+    in the same transaction as the data (so other processes' writes count):
+      "live"  valid until any new data arrives (today, calendar, ...)
+      "past"  valid until data for a finished day changes (back-dated
+              /bulk rows, retention), so past days outlive many posts
+    """
+    def __init__(self, max_entries=256, max_rows=200000):
+        self.max_entries = max_entries
+        self.max_rows    = max_rows
+        self.clear()
+
+    def clear(self):
+        self._lock    = threading.Lock()
+        self._entries = OrderedDict()   # key -> (kind, stamp, rows)
+        self.rows     = 0
+        self.hits     = 0
+        self.misses   = 0
+        self.evicted  = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key, generation):
+        """Cached rows for key if still current, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                kind, stamp, rows = entry
+                if stamp == generation[kind == "past"]:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(rows)
+                del self._entries[key]
+                self.rows -= len(rows)
+            self.misses += 1
+            return None
+
+    def put(self, key, kind, generation, rows):
+        if len(rows) > self.max_rows:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.rows -= len(old[2])
+            self._entries[key] = (kind, generation[kind == "past"], rows)
+            self.rows += len(rows)
+            while len(self._entries) > self.max_entries or self.rows > self.max_rows:
+                _, (_, _, dropped) = self._entries.popitem(last=False)
+                self.rows -= len(dropped)
+                self.evicted += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries":  len(self._entries),
+            "rows":     self.rows,
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evicted":  self.evicted,
+            "max_entries": self.max_entries,
+            "max_rows":    self.max_rows,
+        }
+
+
+class _ReaderCloser:
+    # Kept in a thread's threading.local next to its reader connection and
+    # nowhere else, so it is released when the thread ends and closes the
+    # connection then. The connection is in a reference cycle with its
+    # statement cache and would otherwise wait for the garbage collector.
+    def __init__(self, conn):
+        self.conn = conn
+        self.pid  = os.getpid()
+
+    def close(self):
+        if self.pid != os.getpid():
+            # inherited across a fork: dropped, never closed (see _check_fork)
+            return
+        try:
+            self.conn.close()
+        except sqlite3.ProgrammingError:
+            # owned by another thread; dropped with the pool
+            pass
+
+    __del__ = close
+
+
 class Database:
-    def __init__(self, database="./logger_data.db"):
-        self.database = database
+    # Connection pool:
+    #   one writer connection, shared by all threads and serialised by a lock
+    #   one read-only connection per thread (gunicorn gthread workers), closed
+    #   when its thread ends (the standalone server runs a thread per request)
+    # Connections are opened lazily and re-opened after a fork, so the
+    # copy made in the gunicorn arbiter is never used by a worker.
+    STATEMENT_CACHE = 256               # prepared statements kept per connection
+    READ_MMAP_SIZE  = 256 * 1024 * 1024 # bytes of the file memory-mapped by readers
+    READ_CACHE_KIB  = 16 * 1024         # page cache per reader (KiB)
+    BUSY_TIMEOUT_MS = 5000
+
+    # Time partitions:
+    #   With partition="month" (or "year") datalog and readings rows go to
+    #   one file per period next to the main file, e.g. logger_data-2025-07.db,
+    #   keyed by UTC time. Queries ATTACH only the files overlapping the
+    #   requested window. Past periods are no longer written and can be
+    #   backed up, moved or deleted as files. Everything else (users,
+    #   rollups, version) stays in the main file, as do rows logged before
+    #   partitioning was turned on.
+    PARTITION_FORMATS = {None: None, "month": "%Y-%m", "year": "%Y"}
+    MAX_ATTACHED      = 8     # per connection (SQLite's default limit is 10)
+
+    # datalog and readings, created in "main" and in every partition file
+    # source is an id from main.sources (see _intern_sources)
+    LOG_TABLES = (
+        """CREATE TABLE IF NOT EXISTS {db}.datalog (
+            id INTEGER PRIMARY KEY,
+            date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            source INTEGER,
+            value TEXT
+        );""",
+        """CREATE INDEX IF NOT EXISTS {db}.idx_date ON datalog(date);""",
+        # typed numbers from datalog.value, clustered by source then time
+        """CREATE TABLE IF NOT EXISTS {db}.readings (
+            source INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            log_id INTEGER NOT NULL,
+            channel INTEGER NOT NULL,
+            value REAL,
+            PRIMARY KEY (source, ts, log_id, channel)
+        ) WITHOUT ROWID;""",
+        """CREATE INDEX IF NOT EXISTS {db}.idx_readings_ts ON readings(ts);""",
+    )
+
+    # optional full-text index (search=True): an external-content FTS5
+    # table over datalog value and source in each store, kept in step by
+    # triggers so every insert/delete path (add, retention) maintains it.
+    # source is indexed as its id; _fts_query maps words to matching ids
+    SEARCH_TABLES = (
+        """CREATE VIRTUAL TABLE IF NOT EXISTS {db}.datalog_fts USING fts5(
+            value, source, content='datalog', content_rowid='id'
+        );""",
+        """CREATE TRIGGER IF NOT EXISTS {db}.datalog_fts_insert AFTER INSERT ON datalog BEGIN
+            INSERT INTO datalog_fts(rowid, value, source) VALUES (new.id, new.value, new.source);
+        END;""",
+        """CREATE TRIGGER IF NOT EXISTS {db}.datalog_fts_delete AFTER DELETE ON datalog BEGIN
+            INSERT INTO datalog_fts(datalog_fts, rowid, value, source)
+                VALUES ('delete', old.id, old.value, old.source);
+        END;""",
+        """CREATE TRIGGER IF NOT EXISTS {db}.datalog_fts_update AFTER UPDATE ON datalog BEGIN
+            INSERT INTO datalog_fts(datalog_fts, rowid, value, source)
+                VALUES ('delete', old.id, old.value, old.source);
+            INSERT INTO datalog_fts(rowid, value, source) VALUES (new.id, new.value, new.source);
+        END;""",
+    )
+
+    def __init__(self, database="./logger_data.db", partition=None, cache_entries=256, cache_rows=200000,
+                 alerts=None, search=False):
+        if partition not in self.PARTITION_FORMATS:
+            raise ValueError(f"partition must be 'month' or 'year', not {partition!r}")
+        self.database  = database
+        self.partition = partition
+        self.cache     = QueryCache(cache_entries, cache_rows)
+        self.alerts    = alerts
+        self.search_enabled = search
+        self._source_ids = {}     # name -> id, committed rows of sources only
+        self._reset_pool()
+        # source names, stored once; the bulky tables keep the integer id
         self.command(
-            """CREATE TABLE IF NOT EXISTS datalog (
+            """CREATE TABLE IF NOT EXISTS sources (
                 id INTEGER PRIMARY KEY,
-                date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                source TEXT DEFAULT '',
-                value TEXT
+                name TEXT NOT NULL UNIQUE
             );""")
+        for ddl in self.LOG_TABLES:
+            self.command(ddl.format(db="main"))
+        # count/min/max/sum of readings per hour (unix time of the hour start)
+        # and per local day (plus sum of squares, for the Stats page), kept
+        # current by add()
+        self.command(
+            """CREATE TABLE IF NOT EXISTS rollup_hour (
+                hour INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                channel INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                min REAL,
+                max REAL,
+                sum REAL,
+                PRIMARY KEY (hour, source, channel)
+            ) WITHOUT ROWID;""")
+        self.command(
+            """CREATE TABLE IF NOT EXISTS rollup_day (
+                day TEXT NOT NULL,
+                source TEXT NOT NULL,
+                channel INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                min REAL,
+                max REAL,
+                sum REAL,
+                sumsq REAL,
+                PRIMARY KEY (day, source, channel)
+            ) WITHOUT ROWID;""")
+        # which local days have data, for the date picker
         self.command(
-            """CREATE INDEX IF NOT EXISTS idx_date ON datalog(date);""")
+            """CREATE TABLE IF NOT EXISTS calendar_days (
+                local_date TEXT PRIMARY KEY,
+                row_count INTEGER NOT NULL,
+                first_ts INTEGER NOT NULL,
+                last_ts INTEGER NOT NULL
+            ) WITHOUT ROWID;""")
+        # latest reading per source and its count for the local day `today`,
+        # kept current by add(), so status checks never scan datalog
+        self.command(
+            """CREATE TABLE IF NOT EXISTS source_state (
+                source TEXT PRIMARY KEY,
+                last_ts INTEGER NOT NULL,
+                last_value TEXT,
+                today TEXT NOT NULL,
+                count_today INTEGER NOT NULL
+            ) WITHOUT ROWID;""")
+        # alert rule state machines and the events they fired (see Alerts)
+        self.command(
+            """CREATE TABLE IF NOT EXISTS alert_state (
+                rule TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                since INTEGER,
+                updated INTEGER NOT NULL
+            ) WITHOUT ROWID;""")
+        self.command(
+            """CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY,
+                ts INTEGER NOT NULL,
+                rule TEXT NOT NULL,
+                source TEXT,
+                event TEXT NOT NULL,
+                value TEXT,
+                message TEXT
+            );""")
         self.command(
             """CREATE TABLE IF NOT EXISTS version (
                 id INTEGER PRIMARY KEY CHECK (id = 1),
@@ -696,7 +2114,39 @@ class Database:
                 username TEXT PRIMARY KEY,
                 password_hash TEXT NOT NULL
             );""")
-        self.command('pragma journal_mode=wal')
+        # data change counters for QueryCache: any change / change before today
+        self.command(
+            """CREATE TABLE IF NOT EXISTS generation (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                live INTEGER NOT NULL,
+                past INTEGER NOT NULL
+            );""")
+        self.command("""INSERT OR IGNORE INTO generation(id, live, past) VALUES (1, 0, 0)""")
+        # resume point of an unfinished migration step
+        self.command(
+            """CREATE TABLE IF NOT EXISTS migration_progress (
+                version INTEGER PRIMARY KEY,
+                position
+            );""")
+        # rows from before partitioning stay readable in the main file
+        self._legacy_rows = bool(self.fetch("""SELECT 1 FROM main.datalog LIMIT 1"""))
+        self.migrate()
+        if search:
+            for key in [None] + (self._existing_partitions() if self.partition else []):
+                with self._writing(partitions=[key]) as conn:
+                    self._ensure_search(conn, self._schema(key))
+        # Don't carry open connections into forked gunicorn workers
+        self.close()
+
+    def _ensure_search(self, conn, schema):
+        """Create the full-text index in one store, filling it if new."""
+        exists = conn.execute(
+            f"""SELECT 1 FROM {schema}.sqlite_master WHERE name = 'datalog_fts'""").fetchone()
+        for ddl in self.SEARCH_TABLES:
+            conn.execute(ddl.format(db=schema))
+        if not exists:
+            logging.info(f"Building full-text index for {schema}")
+            conn.execute(f"""INSERT INTO {schema}.datalog_fts(datalog_fts) VALUES ('rebuild')""")
 
     def get_version(self):
         try:
@@ -719,33 +2169,710 @@ class Database:
                ON CONFLICT(username) DO UPDATE SET password_hash = excluded.password_hash;""",
             (username, password_hash))
 
+    # -- schema migrations ---------------------------------------------------
+    #
+    # (version, method) in order. migrate() runs every step above the stored
+    # version, holding a file lock so concurrent processes take turns. Long
+    # steps copy in short batched transactions and record their position in
+    # migration_progress, so the writer lock is never held for long and an
+    # interrupted step resumes where it stopped.
+    MIGRATIONS = (
+        (1, "_migrate_readings"),
+        (2, "_migrate_rollups"),
+        (3, "_migrate_calendar"),
+        (4, "_migrate_sumsq"),
+        (5, "_migrate_source_state"),
+        (6, "_migrate_source_ids"),
+    )
+    MIGRATION_BATCH  = 5000              # datalog rows per transaction
+    MIGRATION_WINDOW = 7 * 24 * 3600     # seconds of readings per transaction
+
+    @contextmanager
+    def _migration_lock(self):
+        """Exclusive (advisory) lock across processes using this database."""
+        with open(f"{self.database}.lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def migrate(self):
+        """Bring the database up to the newest version, one step at a time."""
+        with self._migration_lock():
+            # another process may have finished while we waited
+            current = self.get_version()
+            for version, method in self.MIGRATIONS:
+                if version <= current:
+                    continue
+                step = getattr(self, method)
+                logging.info(f"Database migration to version {version}: {step.__doc__}")
+                step(version)
+                with self._writing() as conn:
+                    conn.execute(
+                        """INSERT INTO version(id, version) VALUES (1, ?)
+                           ON CONFLICT(id) DO UPDATE SET version = excluded.version;""",
+                        (version,))
+                    conn.execute("""DELETE FROM migration_progress WHERE version = ?""", (version,))
+                    self._bump_generation(conn, past=True)
+
+    def generation(self):
+        """(live, past) data change counters, see QueryCache."""
+        return self.fetch("""SELECT live, past FROM generation WHERE id = 1""")[0]
+
+    @staticmethod
+    def _bump_generation(conn, past):
+        conn.execute(
+            """UPDATE generation SET live = live + 1, past = past + ? WHERE id = 1""",
+            (int(past),))
+
+    def _progress(self, version):
+        rows = self.fetch("""SELECT position FROM migration_progress WHERE version = ?""", (version,))
+        return rows[0][0] if rows else None
+
+    @staticmethod
+    def _save_progress(conn, version, position):
+        conn.execute(
+            """INSERT INTO migration_progress(version, position) VALUES (?, ?)
+               ON CONFLICT(version) DO UPDATE SET position = excluded.position""",
+            (version, position))
+
+    def _migrate_readings(self, version):
+        """parse datalog values into readings"""
+        # tables first created by an older owlog_user.py have no source column
+        columns = [c[1] for c in self.fetch("""PRAGMA main.table_info(datalog)""")]
+        if "source" not in columns:
+            self.command("""ALTER TABLE main.datalog ADD COLUMN source TEXT DEFAULT ''""")
+        last_id = self._progress(version) or 0
+        while True:
+            rows = self.fetch(
+                """SELECT id, CAST(strftime('%s', date) AS INTEGER), source, value
+                   FROM main.datalog WHERE id > ? ORDER BY id LIMIT ?""",
+                (last_id, self.MIGRATION_BATCH))
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            with self._writing() as conn:
+                conn.executemany(
+                    """INSERT OR IGNORE INTO main.readings(source, ts, log_id, channel, value)
+                       VALUES (?,?,?,?,?)""",
+                    [ (source, ts, log_id, channel, number)
+                      for log_id, ts, source, value in rows
+                      for channel, number in enumerate(_parse_numbers(value)) ])
+                self._save_progress(conn, version, last_id)
+
+    def _migrate_rollups(self, version):
+        """compute hourly and daily rollups from readings"""
+        start = self._progress(version)
+        if start is None:
+            first = self.fetch("""SELECT min(ts) FROM main.readings""")[0][0]
+            if first is None:
+                return
+            start = first - first % 3600
+            with self._writing() as conn:
+                conn.execute("""DELETE FROM rollup_hour""")
+                conn.execute("""DELETE FROM rollup_day""")
+                self._save_progress(conn, version, start)
+        last = self.fetch("""SELECT max(ts) FROM main.readings""")[0][0]
+        while start <= last:
+            # windows are whole hours; a local day spread over two windows
+            # is merged by the upsert
+            end = start + self.MIGRATION_WINDOW
+            with self._writing() as conn:
+                conn.execute(
+                    """INSERT INTO rollup_hour(hour, source, channel, count, min, max, sum)
+                       SELECT (ts / 3600) * 3600, source, channel,
+                              count(value), min(value), max(value), sum(value)
+                       FROM main.readings WHERE ts >= ? AND ts < ? GROUP BY 1, 2, 3""",
+                    (start, end))
+                conn.execute(
+                    """INSERT INTO rollup_day(day, source, channel, count, min, max, sum)
+                       SELECT DATE(ts, 'unixepoch', 'localtime'), source, channel,
+                              count(value), min(value), max(value), sum(value)
+                       FROM main.readings WHERE ts >= ? AND ts < ? GROUP BY 1, 2, 3
+                       ON CONFLICT(day, source, channel) DO UPDATE SET
+                           count = count + excluded.count,
+                           min   = min(min, excluded.min),
+                           max   = max(max, excluded.max),
+                           sum   = sum + excluded.sum""",
+                    (start, end))
+                self._save_progress(conn, version, end)
+            start = end
+
+    def _migrate_calendar(self, version):
+        """count days with data into calendar_days"""
+        self._rebuild_calendar()
+
+    _CALENDAR_UPSERT = """INSERT INTO calendar_days(local_date, row_count, first_ts, last_ts)
+               VALUES (?,?,?,?)
+               ON CONFLICT(local_date) DO UPDATE SET
+                   row_count = row_count + excluded.row_count,
+                   first_ts  = min(first_ts, excluded.first_ts),
+                   last_ts   = max(last_ts, excluded.last_ts)"""
+
+    def _rebuild_calendar(self):
+        """Recompute calendar_days from datalog in every store."""
+        days = self._fetch_parts(
+            """SELECT DATE(date, 'localtime'), count(*),
+                      min(CAST(strftime('%s', date) AS INTEGER)),
+                      max(CAST(strftime('%s', date) AS INTEGER))
+               FROM {db}.datalog GROUP BY 1""")
+        with self._writing() as conn:
+            conn.execute("""DELETE FROM calendar_days""")
+            # a local day can appear in two partitions; the upsert merges them
+            conn.executemany(self._CALENDAR_UPSERT, days)
+
+    # rows (source, ts, value, local date of now, rows logged on that date);
+    # a later day resets the count, back-dated rows leave last_* alone
+    _STATE_UPSERT = """INSERT INTO source_state(source, last_ts, last_value, today, count_today)
+               VALUES (?,?,?,?,?)
+               ON CONFLICT(source) DO UPDATE SET
+                   count_today = CASE
+                       WHEN excluded.today = today THEN count_today + excluded.count_today
+                       WHEN excluded.today > today THEN excluded.count_today
+                       ELSE count_today END,
+                   today       = max(today, excluded.today),
+                   last_value  = CASE WHEN excluded.last_ts >= last_ts
+                                      THEN excluded.last_value ELSE last_value END,
+                   last_ts     = max(last_ts, excluded.last_ts)"""
+
+    def _migrate_source_state(self, version):
+        """record the latest reading of each source in source_state"""
+        today = dt.date.today()
+        # a bare column beside a single max() comes from the row holding it
+        states = self._fetch_parts(
+            """SELECT source, max(CAST(strftime('%s', date) AS INTEGER)), value, ?, sum(date >= ?)
+               FROM {db}.datalog GROUP BY source""",
+            (today.isoformat(), _sql_time(_local_midnight_utc(today))))
+        with self._writing() as conn:
+            conn.execute("""DELETE FROM source_state""")
+            conn.executemany(self._STATE_UPSERT, states)
+
+    def _migrate_source_ids(self, version):
+        """store sources as ids from the sources table in datalog and readings"""
+        # Each store's tables are renamed to *_old, recreated, and the rows
+        # moved across a batch per transaction (copy, then delete from the
+        # old table), so an interrupted step resumes from what is left.
+        stores = [None] + (self._existing_partitions() if self.partition else [])
+        for key in stores:
+            schema = self._schema(key)
+            with self._writing(partitions=[key]) as conn:
+                moving = conn.execute(
+                    f"""SELECT 1 FROM {schema}.sqlite_master WHERE name = 'datalog_old'""").fetchone()
+                if not moving:
+                    columns = { c[1]: c[2] for c in conn.execute(f"""PRAGMA {schema}.table_info(datalog)""") }
+                    if columns.get("source", "").upper() != "TEXT":
+                        continue
+                    # the full-text index is rebuilt from the new table at startup
+                    for trigger in ("insert", "delete", "update"):
+                        conn.execute(f"""DROP TRIGGER IF EXISTS {schema}.datalog_fts_{trigger}""")
+                    conn.execute(f"""DROP TABLE IF EXISTS {schema}.datalog_fts""")
+                    conn.execute(f"""ALTER TABLE {schema}.datalog RENAME TO datalog_old""")
+                    conn.execute(f"""ALTER TABLE {schema}.readings RENAME TO readings_old""")
+                    # the indexes moved with the old tables; recreated at the end
+                    for ddl in self.LOG_TABLES:
+                        conn.execute(ddl.format(db=schema))
+                    conn.execute(
+                        f"""INSERT OR IGNORE INTO main.sources(name)
+                            SELECT DISTINCT ifnull(source, '') FROM {schema}.datalog_old""")
+                    conn.execute(
+                        f"""INSERT OR IGNORE INTO main.sources(name)
+                            SELECT DISTINCT source FROM {schema}.readings_old""")
+            for table, columns, select in (
+                    ("datalog", "id", "d.id, d.date, s.id, d.value"),
+                    ("readings", "source, ts, log_id, channel", "s.id, d.ts, d.log_id, d.channel, d.value")):
+                while True:
+                    with self._writing(partitions=[key]) as conn:
+                        conn.execute(
+                            f"""INSERT INTO {schema}.{table}
+                                SELECT {select}
+                                FROM (SELECT * FROM {schema}.{table}_old ORDER BY {columns} LIMIT ?) AS d
+                                JOIN main.sources AS s ON s.name = ifnull(d.source, '')""",
+                            (self.MIGRATION_BATCH,))
+                        count = conn.execute(
+                            f"""DELETE FROM {schema}.{table}_old WHERE ({columns}) IN
+                                (SELECT {columns} FROM {schema}.{table}_old ORDER BY {columns} LIMIT ?)""",
+                            (self.MIGRATION_BATCH,)).rowcount
+                    if count < self.MIGRATION_BATCH:
+                        break
+            with self._writing(partitions=[key]) as conn:
+                conn.execute(f"""DROP TABLE {schema}.datalog_old""")
+                conn.execute(f"""DROP TABLE {schema}.readings_old""")
+                for ddl in self.LOG_TABLES:
+                    conn.execute(ddl.format(db=schema))
+
+    def _intern_sources(self, conn, names):
+        """
+        name -> id for source names, adding new names to sources in the
+        caller's transaction. Returns (ids, new) where `new` should go into
+        the cache only once that transaction has committed.
+        """
+        new = {}
+        for name in set(names) - self._source_ids.keys():
+            conn.execute("""INSERT OR IGNORE INTO sources(name) VALUES (?)""", (name,))
+            new[name] = conn.execute("""SELECT id FROM sources WHERE name = ?""", (name,)).fetchone()[0]
+        return {**self._source_ids, **new}, new
+
+    def source_ids(self, names):
+        """name -> id for the known ones of `names` (for query filters)."""
+        if not set(names) <= self._source_ids.keys():
+            # added by another process since we last looked
+            self._source_ids.update(self.fetch("""SELECT name, id FROM sources"""))
+        return { name: self._source_ids[name] for name in names if name in self._source_ids }
+
+    def sources(self):
+        # (id, name) of every source ever logged
+        return self.fetch("""SELECT id, name FROM sources ORDER BY id""", cache="live")
+
+    def _insert_state(self, conn, rows):
+        """Fold (source, value, moment) rows of one add_many() into source_state."""
+        today = dt.date.today()
+        states = {}
+        for source, value, moment in rows:
+            ts = int(moment.timestamp())
+            last_ts, last_value, count = states.get(source, (ts, value, 0))
+            if ts >= last_ts:
+                last_ts, last_value = ts, value
+            if moment.astimezone().date() == today:
+                count += 1
+            states[source] = (last_ts, last_value, count)
+        conn.executemany(
+            self._STATE_UPSERT,
+            [ (source, last_ts, last_value, today.isoformat(), count)
+              for source, (last_ts, last_value, count) in states.items() ])
+
+    def search(self, query, limit=50, before=None):
+        """
+        Newest-first datalog rows matching an FTS5 query, across every store.
+        before=(date, id) of the previous page's last row continues from it.
+        Returns (date, id, local time, source, value) rows.
+        """
+        where  = "datalog_fts MATCH ?"
+        params = (query,)
+        if before is not None:
+            where  += " AND (d.date, d.id) < (?, ?)"
+            params += tuple(before)
+        rows = []
+        # stores cover consecutive time ranges, so newest store first
+        for key in reversed(self._route()):
+            self._reader()
+            schema = self._attach(self._local.conn, self._local.attached, key)
+            rows += self.fetch(
+                f"""SELECT d.date, d.id, DATETIME(d.date, 'localtime'), s.name, d.value
+                    FROM {schema}.datalog_fts JOIN {schema}.datalog AS d ON d.id = datalog_fts.rowid
+                    JOIN main.sources AS s ON s.id = d.source
+                    WHERE {where} ORDER BY d.date DESC, d.id DESC LIMIT ?""",
+                params + (limit - len(rows),))
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def check_alerts(self):
+        """Silence check outside ingest (status polls), at most once per interval."""
+        if self.alerts is None or not self.alerts.due():
+            return
+        with self._writing(immediate=True) as conn:
+            events = self.alerts.check_silence(conn, int(time.time()))
+        if events:
+            self.alerts.notify(events)
+
+    def alert_events(self, limit=50):
+        # newest first: (ts, rule, source, event, value, message)
+        return self.fetch(
+            """SELECT ts, rule, source, event, value, message FROM alerts
+               ORDER BY id DESC LIMIT ?""",
+            (limit,))
+
+    def alert_firing(self):
+        # (rule, since) for rules currently firing
+        return self.fetch(
+            """SELECT rule, since FROM alert_state WHERE state = 'firing' ORDER BY since""")
+
+    def source_state(self):
+        # (source, last_ts, last_value, count_today), O(sources)
+        today = dt.date.today().isoformat()
+        return self.fetch(
+            """SELECT source, last_ts, last_value, CASE WHEN today = ? THEN count_today ELSE 0 END
+               FROM source_state ORDER BY source""",
+            (today,))
+
+    def _recount_day(self, local_date):
+        """Refresh one calendar_days row from datalog (after deletions)."""
+        span  = _local_day_span(dt.date.fromisoformat(local_date))
+        stats = self._fetch_parts(
+            """SELECT count(*), min(CAST(strftime('%s', date) AS INTEGER)),
+                      max(CAST(strftime('%s', date) AS INTEGER))
+               FROM {db}.datalog WHERE date >= ? AND date < ?""",
+            tuple(map(_sql_time, span)), *span)
+        count = sum(c for c, _, _ in stats)
+        with self._writing() as conn:
+            conn.execute("""DELETE FROM calendar_days WHERE local_date = ?""", (local_date,))
+            if count:
+                conn.execute(self._CALENDAR_UPSERT, (
+                    local_date, count,
+                    min(f for c, f, _ in stats if c),
+                    max(l for c, _, l in stats if c)))
+
+    def _migrate_sumsq(self, version):
+        """add sums of squares to the daily rollups"""
+        start = self._progress(version)
+        if start is None:
+            columns = [c[1] for c in self.fetch("""PRAGMA main.table_info(rollup_day)""")]
+            firsts = [ first for first, in self._fetch_parts("""SELECT min(ts) FROM {db}.readings""")
+                       if first is not None ]
+            with self._writing() as conn:
+                if "sumsq" not in columns:
+                    conn.execute("""ALTER TABLE rollup_day ADD COLUMN sumsq REAL""")
+                conn.execute("""UPDATE rollup_day SET sumsq = 0""")
+                if not firsts:
+                    return
+                start = min(firsts) - min(firsts) % 3600
+                self._save_progress(conn, version, start)
+        last = max( l for l, in self._fetch_parts("""SELECT max(ts) FROM {db}.readings""")
+                    if l is not None )
+        while start <= last:
+            end = start + self.MIGRATION_WINDOW
+            keys = self._route(dt.datetime.fromtimestamp(start, dt.timezone.utc),
+                               dt.datetime.fromtimestamp(end, dt.timezone.utc))
+            with self._writing(partitions=keys) as conn:
+                for key in keys:
+                    conn.execute(
+                        f"""INSERT INTO rollup_day(day, source, channel, count, sumsq)
+                            SELECT DATE(ts, 'unixepoch', 'localtime'), source, channel,
+                                   0, sum(value * value)
+                            FROM {self._schema(key)}.readings WHERE ts >= ? AND ts < ? GROUP BY 1, 2, 3
+                            ON CONFLICT(day, source, channel) DO UPDATE SET
+                                sumsq = sumsq + excluded.sumsq""",
+                        (start, end))
+                self._save_progress(conn, version, end)
+            start = end
+
+    def _insert_calendar(self, conn, stamps):
+        """Count unix times `stamps` of new datalog rows into calendar_days."""
+        days = {}
+        for ts in stamps:
+            day = dt.date.fromtimestamp(ts).isoformat()
+            count, first, last = days.get(day, (0, ts, ts))
+            days[day] = (count + 1, min(first, ts), max(last, ts))
+        conn.executemany(
+            self._CALENDAR_UPSERT,
+            [ (day, count, first, last) for day, (count, first, last) in days.items() ])
+
+    def _insert_rollups(self, conn, readings):
+        """Add (source, ts, log_id, channel, value) readings to the rollups."""
+        conn.executemany(
+            """INSERT INTO rollup_hour(hour, source, channel, count, min, max, sum)
+               VALUES (?,?,?,1,?,?,?)
+               ON CONFLICT(hour, source, channel) DO UPDATE SET
+                   count = count + excluded.count,
+                   min   = min(min, excluded.min),
+                   max   = max(max, excluded.max),
+                   sum   = sum + excluded.sum""",
+            [ (ts - ts % 3600, source, channel, value, value, value)
+              for source, ts, log_id, channel, value in readings ])
+        conn.executemany(
+            """INSERT INTO rollup_day(day, source, channel, count, min, max, sum, sumsq)
+               VALUES (?,?,?,1,?,?,?,?)
+               ON CONFLICT(day, source, channel) DO UPDATE SET
+                   count = count + excluded.count,
+                   min   = min(min, excluded.min),
+                   max   = max(max, excluded.max),
+                   sum   = sum + excluded.sum,
+                   sumsq = sumsq + excluded.sumsq""",
+            [ (dt.date.fromtimestamp(ts).isoformat(), source, channel, value, value, value, value * value)
+              for source, ts, log_id, channel, value in readings ])
+
     def add(self, source, value):
         logging.debug(f"Adding _{value}")
-        self.command(
-            """INSERT INTO datalog(source, value) VALUES (?,?)""",
-            (source, value))
+        self.add_many([(source, value, None)])
+
+    def add_many(self, rows):
+        """
+        Store (source, value, moment) rows in one transaction.
+        moment is a UTC datetime, or None for now.
+        """
+        now = dt.datetime.now(dt.timezone.utc)
+        parts = {}
+        for source, value, moment in rows:
+            source = source or ""
+            moment = moment or now
+            parts.setdefault(self._partition_key(moment), []).append((source, value, moment))
+        if len(parts) > self.MAX_ATTACHED:
+            # one connection can't attach every file; a transaction per group
+            keys = list(parts)
+            for i in range(0, len(keys), self.MAX_ATTACHED):
+                self.add_many([ row for key in keys[i:i + self.MAX_ATTACHED] for row in parts[key] ])
+            return
+        with self._writing(immediate=True, partitions=parts) as conn:
+            readings = []
+            today = _local_midnight_utc(dt.date.today())
+            self._bump_generation(conn, past=any(m < today for part in parts.values() for _, _, m in part))
+            self._insert_calendar(conn, [ int(m.timestamp()) for part in parts.values() for _, _, m in part ])
+            self._insert_state(conn, [ row for part in parts.values() for row in part ])
+            events = []
+            if self.alerts is not None:
+                events = self.alerts.ingest(conn, [ row for part in parts.values() for row in part ])
+                if self.alerts.due():
+                    events += self.alerts.check_silence(conn, int(now.timestamp()))
+            source_ids, new_sources = self._intern_sources(
+                conn, [ source for part in parts.values() for source, _, _ in part ])
+            for key, part in parts.items():
+                schema = self._schema(key)
+                # ids are assigned here so one executemany can insert them all;
+                # BEGIN IMMEDIATE keeps other processes from taking the same ids
+                next_id = conn.execute(
+                    f"""SELECT ifnull(max(id), 0) + 1 FROM {schema}.datalog""").fetchone()[0]
+                logged  = []
+                typed   = []
+                for log_id, (source, value, moment) in enumerate(part, next_id):
+                    ts = int(moment.timestamp())
+                    logged.append((log_id, _sql_time(moment), source_ids[source], value))
+                    typed.extend(
+                        (source, ts, log_id, channel, number)
+                        for channel, number in enumerate(_parse_numbers(value)) )
+                conn.executemany(
+                    f"""INSERT INTO {schema}.datalog(id, date, source, value) VALUES (?,?,?,?)""",
+                    logged)
+                conn.executemany(
+                    f"""INSERT INTO {schema}.readings(source, ts, log_id, channel, value)
+                        VALUES (?,?,?,?,?)""",
+                    [ (source_ids[source], *reading) for source, *reading in typed ])
+                readings.extend(typed)
+            self._insert_rollups(conn, readings)
+        self._source_ids.update(new_sources)
+        if events:
+            self.alerts.notify(events)
+
+    def _delete_batches(self, table, columns, where, value, batch, pause, key=None):
+        """Delete matching rows `batch` at a time, one short transaction each."""
+        total = 0
+        while True:
+            with self._writing(partitions=[key]) as conn:
+                table_name = f"{self._schema(key)}.{table}"
+                count = conn.execute(
+                    f"""DELETE FROM {table_name} WHERE ({columns}) IN
+                        (SELECT {columns} FROM {table_name} WHERE {where} LIMIT ?)""",
+                    (value, batch)).rowcount
+            total += count
+            if count < batch:
+                return total
+            self._vacuum_step(batch, key)
+            # let waiting writers in between batches
+            time.sleep(pause)
+
+    def _vacuum_step(self, pages, key=None):
+        """
+        Give up to `pages` free pages back to the filesystem.
+        Returns the pages still free, or None if auto_vacuum isn't INCREMENTAL.
+        """
+        with self._writing(partitions=[key]) as conn:
+            schema = self._schema(key)
+            if conn.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] != 2:
+                return None
+            # executescript steps the pragma to completion; execute() frees one page
+            conn.executescript(f"PRAGMA {schema}.incremental_vacuum({pages});")
+            return conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+
+    def _store_size(self, key=None):
+        """Bytes in the main file or a partition file."""
+        with self._writing(partitions=[key]) as conn:
+            schema = self._schema(key)
+            return ( conn.execute(f"PRAGMA {schema}.page_count").fetchone()[0]
+                   * conn.execute(f"PRAGMA {schema}.page_size").fetchone()[0] )
+
+    def enforce_retention(self, raw_days=0, hourly_days=0, daily_days=0, batch=5000, pause=0.05):
+        """
+        Delete data past its retention (0 days = keep forever):
+            raw_days     datalog and readings
+            hourly_days  rollup_hour
+            daily_days   rollup_day
+        Raw data needs no separate downsampling: rollups are kept at ingest.
+        Partitions entirely past raw_days are removed as files.
+        Returns rows deleted per table and bytes given back to the filesystem.
+        """
+        now     = dt.datetime.now(dt.timezone.utc)
+        report  = {"datalog": 0, "readings": 0, "rollup_hour": 0, "rollup_day": 0,
+                   "partitions_dropped": 0, "bytes_reclaimed": 0}
+        touched = {None: self._store_size()}
+        if raw_days > 0:
+            cutoff = now - dt.timedelta(days=raw_days)
+            for key in self._route():
+                if key is not None:
+                    start, end = self._period_span(key)
+                    if end <= cutoff:
+                        report["bytes_reclaimed"] += self._drop_partition(key)
+                        report["partitions_dropped"] += 1
+                        continue
+                    if start >= cutoff:
+                        continue
+                    touched[key] = self._store_size(key)
+                report["readings"] += self._delete_batches(
+                    "readings", "source, ts, log_id, channel", "ts < ?",
+                    int(cutoff.timestamp()), batch, pause, key)
+                report["datalog"] += self._delete_batches(
+                    "datalog", "id", "date < ?",
+                    _sql_time(cutoff), batch, pause, key)
+            cut_day = dt.date.fromtimestamp(cutoff.timestamp()).isoformat()
+            self.command("""DELETE FROM calendar_days WHERE local_date < ?""", (cut_day,))
+            self._recount_day(cut_day)
+        if hourly_days > 0:
+            cutoff = now - dt.timedelta(days=hourly_days)
+            report["rollup_hour"] = self._delete_batches(
+                "rollup_hour", "hour, source, channel", "hour < ?",
+                int(cutoff.timestamp()), batch, pause)
+        if daily_days > 0:
+            cutoff = dt.date.today() - dt.timedelta(days=daily_days)
+            report["rollup_day"] = self._delete_batches(
+                "rollup_day", "day, source, channel", "day < ?",
+                cutoff.isoformat(), batch, pause)
+
+        report["free_pages"] = 0
+        for key, before in touched.items():
+            while (free := self._vacuum_step(batch, key)):
+                time.sleep(pause)
+            if free is None:
+                logging.info(
+                    f"Freed pages in {self._store_path(key)} are reused but the file will not "
+                    "shrink: auto_vacuum is not INCREMENTAL. "
+                    "Once, offline: sqlite3 <db> 'PRAGMA auto_vacuum=INCREMENTAL; VACUUM;'")
+                with self._writing(partitions=[key]) as conn:
+                    free = conn.execute(f"PRAGMA {self._schema(key)}.freelist_count").fetchone()[0]
+            report["free_pages"] += free
+            report["bytes_reclaimed"] += before - self._store_size(key)
+        with self._writing() as conn:
+            self._bump_generation(conn, past=True)
+        # fold the WAL back into the database and truncate it
+        self._writer_pragma("PRAGMA wal_checkpoint(TRUNCATE)")
+        return report
+
+    def _writer_pragma(self, pragma):
+        """Run a PRAGMA that must not be inside a transaction, on the writer."""
+        with self._writing() as conn:
+            return conn.execute(pragma).fetchall()
 
     def day_data(self, day):
-        nextday = day + dt.timedelta(days=1)
+        span = _local_day_span(day)
+        start, end = map(_sql_time, span)
+        return self._fetch_parts(
+            """SELECT TIME(d.date, 'localtime') as t, s.name, d.value
+               FROM {db}.datalog AS d JOIN main.sources AS s ON s.id = d.source
+               WHERE d.date >= ? AND d.date < ? ORDER BY d.date""",
+            (start, end), *span, cache=_cache_class(span[1]))
+
+    def day_readings(self, day):
+        # numbers for one local day, t as local "HH:MM:SS" like day_data()
+        span = _local_day_span(day)
+        start, end = (int(m.timestamp()) for m in span)
+        return _group_readings(self._fetch_parts(
+            """SELECT r.log_id, TIME(r.ts, 'unixepoch', 'localtime'), s.name, r.value
+               FROM {db}.readings AS r JOIN main.sources AS s ON s.id = r.source
+               WHERE r.ts >= ? AND r.ts < ?
+               ORDER BY r.ts, r.source, r.log_id, r.channel""",
+            (start, end), *span, cache=_cache_class(span[1])))
+
+    def back_rollup(self, day, back_days):
+        # hourly averages for a span of days, t in days (mid-hour) since local midnight
+        # of the first day
+        span = _local_day_span(day + dt.timedelta(days=-back_days), back_days + 1)
+        start, end = (int(m.timestamp()) for m in span)
+        return _group_readings(self.fetch(
+            """SELECT hour, (hour + 1800 - ?) / 86400.0, source, sum / count
+               FROM rollup_hour WHERE hour >= ? AND hour < ?
+               ORDER BY hour, source, channel""",
+            (start, start, end), cache=_cache_class(span[1])))
+
+    def back_rollup_days(self, day, back_days):
+        # daily averages for a span of days, t in days (mid-day)
+        first = (day + dt.timedelta(days=-back_days)).date().isoformat()
+        last  = day.date().isoformat()
+        return _group_readings(self.fetch(
+            """SELECT day, julianday(day) - julianday(?) + 0.5, source, sum / count
+               FROM rollup_day WHERE day >= ? AND day <= ?
+               ORDER BY day, source, channel""",
+            (first, first, last), cache=_cache_class(_local_day_span(day)[1])))
+
+    def stats(self, day, back_days):
+        # (source, channel, count, min, max, sum, sumsq) over whole local days
+        first = (day + dt.timedelta(days=-back_days)).date().isoformat()
+        last  = day.date().isoformat()
         return self.fetch(
-            """SELECT TIME(date, 'localtime') as t, source, value FROM datalog
-               WHERE DATE(date,'localtime') BETWEEN DATE(?) AND DATE(?) ORDER BY t""",
-            (day.isoformat(), nextday.isoformat()))
-
-    def back_data(self, day, back_days):
-        nextday  = day + dt.timedelta(days=1)
-        firstday = day + dt.timedelta(days=-back_days)
-        return self.fetch(
-            """SELECT strftime('%J',date,'localtime')-strftime("%J",?,'localtime') as t, source, value
-               FROM datalog
-               WHERE DATE(date,'localtime') BETWEEN DATE(?) AND DATE(?) ORDER BY t""",
-            (firstday.isoformat(), firstday.isoformat(), nextday.isoformat()))
+            """SELECT source, channel, sum(count), min(min), max(max), sum(sum), sum(sumsq)
+               FROM rollup_day WHERE day >= ? AND day <= ?
+               GROUP BY source, channel ORDER BY source, channel""",
+            (first, last), cache=_cache_class(_local_day_span(day)[1]))
+
+    SERIES_AGGS = ("min", "max", "avg", "last", "count")
+
+    def series(self, first, last, bucket, agg, sources=()):
+        """
+        Readings for local days first..last (inclusive) grouped into
+        `bucket`-second buckets, aligned to local time at the start of the
+        range, and reduced by agg (one of SERIES_AGGS).
+        Returns [source, channel, [bucket start (unix time)], [value]] lists.
+        """
+        span = _local_day_span(first, (last - first).days + 1)
+        start, end = (int(m.timestamp()) for m in span)
+        offset = int(span[0].astimezone().utcoffset().total_seconds())
+        where = "r.ts >= ? AND r.ts < ?"
+        params = (start, end)
+        if sources:
+            ids = list(self.source_ids(sources).values())
+            if not ids:
+                return []
+            where += f" AND r.source IN ({', '.join('?' * len(ids))})"
+            params += tuple(ids)
+        # partial aggregates per store, merged below: a bucket can straddle
+        # two partition files. A bare column next to a single max() is
+        # taken from the row holding the max (SQLite rule), i.e. the last.
+        columns = "r.value, max(r.ts)" if agg == "last" else "count(*), min(r.value), max(r.value), sum(r.value)"
+        rows = self._fetch_parts(
+            f"""SELECT s.name, r.channel, (r.ts + ?) / ? AS b, {columns}
+                FROM {{db}}.readings AS r JOIN main.sources AS s ON s.id = r.source
+                WHERE {where}
+                GROUP BY r.source, r.channel, b""",
+            (offset, bucket) + params, *span, cache=_cache_class(span[1]))
+        merged = {}
+        for source, channel, b, *acc in rows:
+            old = merged.setdefault((source, channel, b), acc)
+            if old is acc:
+                continue
+            if agg == "last":
+                if acc[1] > old[1]:
+                    merged[(source, channel, b)] = acc
+            else:
+                merged[(source, channel, b)] = [
+                    old[0] + acc[0], min(old[1], acc[1]), max(old[2], acc[2]), old[3] + acc[3]]
+        reduce = {
+            "last":  lambda acc: acc[0],
+            "count": lambda acc: acc[0],
+            "min":   lambda acc: acc[1],
+            "max":   lambda acc: acc[2],
+            "avg":   lambda acc: acc[3] / acc[0],
+        }[agg]
+        result = []
+        for (source, channel, b), acc in sorted(merged.items()):
+            if not result or result[-1][:2] != [source, channel]:
+                result.append([source, channel, [], []])
+            result[-1][2].append(b * bucket - offset)
+            result[-1][3].append(reduce(acc))
+        return result
 
     def plot_data(self):
-        return self.fetch(
-            """SELECT (strftime('%J',date)-strftime('%J','now'))*24 as t, source, value
-               FROM datalog
-               WHERE date >= datetime('now','-1 day') ORDER BY t""",())
+        # last 24 hours, t in hours before now (-24 to 0)
+        return _group_readings(self.plot_rows())
+
+    def plot_rows(self):
+        # plot_data() ungrouped: (log_id, hours before now, source, value) per number
+        # now is whole minutes (under a pixel at 800 wide) so the query can be cached
+        moment = dt.datetime.now(dt.timezone.utc).replace(second=0, microsecond=0)
+        now = int(moment.timestamp())
+        return self._fetch_parts(
+            """SELECT r.log_id, (r.ts - ?) / 3600.0, s.name, r.value
+               FROM {db}.readings AS r JOIN main.sources AS s ON s.id = r.source
+               WHERE r.ts >= ?
+               ORDER BY r.ts, r.source, r.log_id, r.channel""",
+            (now, now - 86400), moment - dt.timedelta(days=1), moment + dt.timedelta(minutes=1),
+            cache="live")
 
     def now_time(self):
         # returns sqlite3's version of fraction of day of current time
@@ -753,32 +2880,69 @@ class Database:
         return self.fetch(
             """SELECT strftime('%J','now','localtime')*1""",())[0][0] % 1
 
-    def week_data(self, day):
-        return self.back_data( day, 6 )
-
-    def month_data(self, day):
-        return self.back_data( day, 30 )
-
     def distinct_days(self, day):
-        firstday = day + dt.timedelta(days=-34)
-        lastday  = day + dt.timedelta(days=34)
+        first = (day + dt.timedelta(days=-34)).date().isoformat()
+        last  = (day + dt.timedelta(days=34)).date().isoformat()
         return self.fetch(
-            """SELECT DISTINCT DATE(date,'localtime') as d FROM datalog
-               WHERE DATE(date,'localtime') BETWEEN DATE(?) AND DATE(?) ORDER BY d""",
-            (firstday.isoformat(), lastday.isoformat()))
+            """SELECT local_date FROM calendar_days
+               WHERE local_date >= ? AND local_date <= ? ORDER BY local_date""",
+            (first, last), cache="live")
 
     def distinct_months(self, day):
-        year_start = f"{day.year}-01-01"
-        year_end   = f"{day.year + 1}-01-01"
         return self.fetch(
-            """SELECT DISTINCT strftime('%m', date,'localtime') AS m FROM datalog
-               WHERE DATE(date,'localtime') >= ? AND DATE(date,'localtime') < ? ORDER BY m""",
-            (year_start, year_end))
+            """SELECT DISTINCT substr(local_date, 6, 2) AS m FROM calendar_days
+               WHERE local_date >= ? AND local_date < ? ORDER BY m""",
+            (f"{day.year}-01-01", f"{day.year + 1}-01-01"), cache="live")
 
     def distinct_years(self):
         return self.fetch(
-            """SELECT DISTINCT strftime('%Y', date,'localtime') AS y FROM datalog ORDER BY y""",
-            None)
+            """SELECT DISTINCT substr(local_date, 1, 4) AS y FROM calendar_days ORDER BY y""",
+            None, cache="live")
+
+    def calendar_month(self, year, month):
+        # (local_date, row_count, first_ts, last_ts) for days with data
+        first = dt.date(year, month, 1)
+        last  = (first + dt.timedelta(days=32)).replace(day=1)
+        return self.fetch(
+            """SELECT local_date, row_count, first_ts, last_ts FROM calendar_days
+               WHERE local_date >= ? AND local_date < ? ORDER BY local_date""",
+            (first.isoformat(), last.isoformat()), cache=_cache_class(_local_midnight_utc(last)))
+
+    def export_rows(self, first, last, source=None, chunk=2000):
+        """
+        Generator of raw (partition, id, UTC date, local date, source, value)
+        rows for local days first..last inclusive, oldest first. datalog ids
+        are only unique within a store, hence the partition key ("" for the
+        main file). Each store is read
+        through one cursor `chunk` rows at a time, so memory stays flat
+        however long the range.
+        """
+        span = _local_day_span(first, (last - first).days + 1)
+        where = "d.date >= ? AND d.date < ?"
+        params = tuple(map(_sql_time, span))
+        if source is not None:
+            ids = self.source_ids([source])
+            if not ids:
+                return
+            where += " AND d.source = ?"
+            params += (ids[source],)
+        for key in self._route(*span):
+            conn = self._reader()
+            schema = "main" if key is None else self._attach(conn, self._local.attached, key)
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"""SELECT ?, d.id, d.date, DATETIME(d.date, 'localtime'), s.name, d.value
+                        FROM {schema}.datalog AS d JOIN main.sources AS s ON s.id = d.source
+                        WHERE {where} ORDER BY d.date, d.id""",
+                    (key or "",) + params)
+                while rows := cursor.fetchmany(chunk):
+                    yield from rows
+            except sqlite3.Error as e:
+                logging.error(f"Database reading error <{self.database}>: {e}")
+                raise
+            finally:
+                cursor.close()
 
     def get_password(self, username):
         return self.fetch(
@@ -788,39 +2952,248 @@ class Database:
     def hash_password(self, password):
         return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
-    def _get_connection(self):
+    def _reset_pool(self):
+        """Forget all connections (new process or after close)."""
+        self._pid        = os.getpid()
+        self._local      = threading.local()
+        self._write_lock = threading.Lock()
+        self._writer     = None
+        self._writer_attached = OrderedDict()
+        self._readers    = weakref.WeakSet()
+        self._pool_lock  = threading.Lock()
+
+    def _check_fork(self):
+        # SQLite connections must not cross a fork; the child starts afresh.
+        # The inherited objects are simply dropped, never used or closed here.
+        if self._pid != os.getpid():
+            logging.debug(f"Database pool re-created in process {os.getpid()}")
+            self._reset_pool()
+            self.cache.clear()
+
+    def _get_connection(self, read_only=False):
         """Standardized connection factory."""
-        conn = sqlite3.connect(self.database)
-        # Force WAL journal mode explicitly on initialization
-        conn.execute("PRAGMA journal_mode=WAL;")
-        # Optional, but highly recommended for multi-threaded web applications:
-        conn.execute("PRAGMA synchronous=NORMAL;") 
+        conn = sqlite3.connect(
+            self.database,
+            cached_statements=self.STATEMENT_CACHE,
+            check_same_thread=read_only,
+            uri=True,
+        )
+        conn.execute(f"PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS};")
+        if read_only:
+            conn.execute("PRAGMA query_only=1;")
+            conn.execute(f"PRAGMA mmap_size={self.READ_MMAP_SIZE};")
+            conn.execute(f"PRAGMA cache_size=-{self.READ_CACHE_KIB};")
+        else:
+            # Only takes effect on a new (empty) database file, so it must
+            # come before anything that writes the header; see enforce_retention()
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+            # Force WAL journal mode explicitly on initialization
+            conn.execute("PRAGMA journal_mode=WAL;")
+            # Optional, but highly recommended for multi-threaded web applications:
+            conn.execute("PRAGMA synchronous=NORMAL;")
         return conn
 
-    def fetch(self, cmd, value_tuple=None):
-        """SQL fetch command"""
+    def _reader(self):
+        """This thread's read-only connection."""
+        self._check_fork()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._get_connection(read_only=True)
+            self._local.conn = conn
+            self._local.attached = OrderedDict()
+            self._local.closer = _ReaderCloser(conn)
+            with self._pool_lock:
+                self._readers.add(self._local.closer)
+        return conn
+
+    @contextmanager
+    def _writing(self, immediate=False, partitions=()):
+        """
+        Exclusive use of the writer connection; one transaction.
+        Partition files for the given keys are attached (and created) first.
+        """
+        self._check_fork()
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._get_connection()
+            for key in partitions:
+                self._attach(self._writer, self._writer_attached, key, create=True)
+            with self._writer as conn:
+                if immediate:
+                    # take SQLite's write lock now rather than at first write
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+
+    # -- partitions --------------------------------------------------------
+
+    def _partition_key(self, moment):
+        """Partition holding rows stamped `moment` (UTC); None = main file."""
+        if self.partition is None:
+            return None
+        return moment.strftime(self.PARTITION_FORMATS[self.partition])
+
+    def _period_span(self, key):
+        """UTC datetimes [start, end) covered by a partition."""
+        start = dt.datetime.strptime(key, self.PARTITION_FORMATS[self.partition]).replace(tzinfo=dt.timezone.utc)
+        if self.partition == "year":
+            return start, start.replace(year=start.year + 1)
+        return start, (start + dt.timedelta(days=32)).replace(day=1)
+
+    def _partition_keys(self, start, end):
+        """Keys of all periods overlapping [start, end), oldest first."""
+        keys = []
+        key = self._partition_key(start)
+        while True:
+            period_start, period_end = self._period_span(key)
+            if period_start >= end:
+                return keys
+            keys.append(key)
+            key = self._partition_key(period_end)
+
+    def _store_path(self, key):
+        if key is None:
+            return self.database
+        return f"{os.path.splitext(self.database)[0]}-{key}.db"
+
+    @staticmethod
+    def _schema(key):
+        """Schema name a store is attached as."""
+        return "main" if key is None else "p" + key.replace("-", "_")
+
+    def _existing_partitions(self):
+        """Keys of the partition files on disk, oldest first."""
+        root = os.path.splitext(self.database)[0]
+        keys = []
+        for path in glob.glob(f"{glob.escape(root)}-*.db"):
+            key = path[len(root) + 1:-3]
+            try:
+                self._period_span(key)
+            except ValueError:
+                continue
+            keys.append(key)
+        return sorted(keys)
+
+    def _route(self, start=None, end=None):
+        """
+        Stores (None = main file, else partition key) that can hold rows
+        in [start, end), oldest first. No bounds means every store.
+        """
+        if self.partition is None:
+            return [None]
+        if start is None:
+            keys = self._existing_partitions()
+        else:
+            keys = [k for k in self._partition_keys(start, end) if os.path.exists(self._store_path(k))]
+        return ([None] if self._legacy_rows else []) + keys
+
+    def _attach(self, conn, attached, key, create=False):
+        """Attach a partition to conn (evicting the least recently used)."""
+        if key is None:
+            return "main"
+        schema = self._schema(key)
+        if schema in attached:
+            attached.move_to_end(schema)
+            return schema
+        while len(attached) >= self.MAX_ATTACHED:
+            old, _ = attached.popitem(last=False)
+            conn.execute(f"DETACH DATABASE {old}")
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (self._store_path(key),))
+        attached[schema] = key
+        if create:
+            conn.execute(f"PRAGMA {schema}.auto_vacuum=INCREMENTAL;")
+            conn.execute(f"PRAGMA {schema}.journal_mode=WAL;")
+            conn.execute(f"PRAGMA {schema}.synchronous=NORMAL;")
+            for ddl in self.LOG_TABLES:
+                conn.execute(ddl.format(db=schema))
+            if self.search_enabled:
+                self._ensure_search(conn, schema)
+                # an index rebuild opens a transaction; the next ATTACH/PRAGMA can't run inside one
+                conn.commit()
+        return schema
+
+    def _drop_partition(self, key):
+        """Delete a partition's files; returns the bytes freed."""
+        schema = self._schema(key)
+        freed  = 0
+        with self._write_lock:
+            if self._writer is not None and schema in self._writer_attached:
+                del self._writer_attached[schema]
+                self._writer.execute(f"DETACH DATABASE {schema}")
+            attached = getattr(self._local, "attached", {})
+            if schema in attached:
+                del attached[schema]
+                self._local.conn.execute(f"DETACH DATABASE {schema}")
+            for path in (self._store_path(key), self._store_path(key) + "-wal", self._store_path(key) + "-shm"):
+                try:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        logging.info(f"Dropped partition {self._store_path(key)}")
+        return freed
+
+    def _fetch_parts(self, cmd, value_tuple=None, start=None, end=None, cache=None):
+        """
+        fetch() on every store that can hold rows in [start, end), oldest
+        first, results concatenated. "{db}" in cmd is the schema name.
+        """
+        rows = []
+        for key in self._route(start, end):
+            if key is None:
+                schema = "main"
+            else:
+                self._reader()
+                schema = self._attach(self._local.conn, self._local.attached, key)
+            rows.extend(self.fetch(cmd.format(db=schema), value_tuple, cache))
+        return rows
+
+    def close(self):
+        """Close pooled connections (process shutdown or before fork)."""
+        if self._pid != os.getpid():
+            return
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+        with self._pool_lock:
+            readers = list(self._readers)
+            self._readers = weakref.WeakSet()
+        for closer in readers:
+            closer.close()
+        self._reset_pool()
+
+    def fetch(self, cmd, value_tuple=None, cache=None):
+        """
+        SQL fetch command
+        cache="live" or "past" reads through the QueryCache (see there)
+        """
+        if cache is not None and self.cache.enabled:
+            generation = self.generation()
+            rows = self.cache.get((cmd, value_tuple), generation)
+            if rows is not None:
+                return rows
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                if value_tuple is not None:
-                    cursor.execute(cmd, value_tuple)
-                else:
-                    cursor.execute(cmd)
-                return cursor.fetchall()
+            cursor = self._reader().cursor()
+            if value_tuple is not None:
+                cursor.execute(cmd, value_tuple)
+            else:
+                cursor.execute(cmd)
+            rows = cursor.fetchall()
         except sqlite3.Error as e:
             logging.error(f"Database reading error <{self.database}>: {e}")
             raise
+        if cache is not None and self.cache.enabled:
+            self.cache.put((cmd, value_tuple), cache, generation, rows)
+            rows = list(rows)
+        return rows
 
     def command(self, cmd, value_tuple=None):
         """SQL non-fetch command (add data or configure)"""
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
+            with self._writing() as conn:
                 if value_tuple is not None:
-                    cursor.execute(cmd, value_tuple)
+                    conn.execute(cmd, value_tuple)
                 else:
-                    cursor.execute(cmd)
-                conn.commit()
+                    conn.execute(cmd)
         except sqlite3.Error as e:
             logging.error(f"Database writing error <{self.database}>: {e}")
             raise
@@ -882,6 +3255,12 @@ def main(sysargs):
         dest="debug", action="store_true",
         help="Print debugging information",
     )
+    parser.add_argument(
+        "--retention",
+        required=False, default=False,
+        dest="retention", action="store_true",
+        help="Apply the retain_* settings to the database and exit (for cron)",
+    )
     parser.add_argument(
         "--no_password",
         required=False, default=toml.get("no_password", False),
@@ -902,6 +3281,12 @@ def main(sysargs):
         enable_no_password=args.no_password,
     )
 
+    if args.retention:
+        report = db.enforce_retention(**retention)
+        logging.info(f"Retention: {report}")
+        db.close()
+        return 0
+
     logging.info(f"Server started {host}:{port}")
     app.run(host=host, port=port, debug=args.debug)
 
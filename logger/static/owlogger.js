@@ -7,85 +7,17 @@
 
 // Shared utility to pull numeric sets from string data rapidly
 // Thanks to Gemini
+// Plot and stat pages are sent the numbers already parsed (array)
 const parseTelemetryNumbers = (str) => {
+    if (Array.isArray(str)) return str;
     if (!str) return [];
     const matches = str.match(/-?(?:\d+\.?\d*|\.?\d+)/g);
     return matches ? matches.map(parseFloat) : [];
 };
 
-class Cumulative {
-    constructor( name ) {
-        this.lines = 0;
-        this.name = name ;
-        //  Calculation from Wikipedia article
-        this.n = 0;
-        this.Q = 0;
-        this.A = 0;
-        this.max = null ;
-        this.min = null ;
-    }
-    add( lines ) {
-        this.lines += 1;
-        lines.forEach( x => {
-            this.n += 1 ;
-            this.Q += (this.n-1)*(x-this.A)**2/this.n ;
-            this.A += (x-this.A)/this.n ;
-            if ( this.n == 1 ) {
-                this.max = x ;
-                this.min = x ;
-            } else {
-                this.max = Math.max( x, this.max ) ;
-                this.min = Math.min( x, this.min ) ;
-            }
-        });
-    }
-    get Max() {
-        return this.max ;
-    }
-    get Min() {
-        return this.min ;
-    }
-    get Lines() {
-        return this.lines ;
-    }
-    get N() {
-        return this.n;
-    }
-    get Avg() {
-        return this.A ;
-    }
-    get Std() {
-        return Math.sqrt( this.Q/Math.max(1,this.n) ) ;
-    }
-    get Name() {
-        return this.name ;
-    }
-}
-class StatCalc {
-    constructor( data ) {
-        this.all = new Cumulative("All") ;
-        this.list = {} ;
-        data.forEach( dline => this.addline(dline) );
-    }
-    addline( dline ) {
-        const numbers = parseTelemetryNumbers(dline[2]) ;
-        this.all.add(numbers);
-        const key = dline[1] ;
-        if ( !(key in this.list) ) {
-            this.list[key] = new Cumulative(key) ;
-        }
-        this.list[key].add(numbers);
-    }
-    All() {
-        return this.all ;
-    }
-    Keys() {
-        return Object.keys(this.list) ;
-    }
-    Cumulative(key) {
-        return this.list[key] ;
-    }
-}
+// Filled from the JSON API by Page.load()
+var globals = {};
+
 class Swipe {
     constructor() {
         this.thresholdX = 100;
@@ -124,6 +56,11 @@ class JumpTo {
     static type(ntype) {
         this.jump( globals.daystart, ntype ) ;
     }
+    static span(nspan) {
+        const url = new URL(location.href);
+        url.searchParams.set('span', nspan);
+        location.assign(url.search);
+    }
     static jump(date,ntype) {
         const url = new URL(location.href);
         url.searchParams.set('date', this.YYYYMMDD(date));
@@ -197,20 +134,36 @@ class Data {
     }
 }
 class Stat extends Data {
+    // Summaries come computed from the server, see _summarize_stats()
     Show() {
         this.table.classList.add("statTable");
-        this.statData = new StatCalc( globals.dayData ) ;
+        this.ShowSpans();
         this.ShowStatTable();
-    }                  
+    }
+    ShowSpans() {
+        const caption = this.table.createCaption();
+        ["day", "week", "month", "year"].forEach( s => {
+            const bu = document.createElement("button");
+            bu.innerHTML = s[0].toUpperCase() + s.slice(1);
+            bu.disabled = ( s == globals.span );
+            bu.onclick = () => JumpTo.span(s);
+            caption.appendChild(bu);
+        });
+    }
     ShowStatTable() {
         ["Source","Types","Values"].forEach( (h,i) => this.thead.insertCell(-1).innerHTML=`<B>${h}</B>` );
-        this.statData.Keys().map( k=> this.statData.Cumulative(k)).forEach( s => this.ShowStat( s ) ) ;
-        this.ShowStat( this.statData.All() );
-    }                  
+        globals.dayData.forEach( s => this.ShowStat( s ) ) ;
+    }
     ShowStat( stat ) {
-        this.ShowRow( [`<B>${stat.Name}</B>`, "Lines, Readings", `${stat.Lines}, ${stat.N}`]);
-        this.ShowRow( ["", "Avg (Std)", (stat.N==0)?"":`${stat.Avg.toFixed(2)} (${stat.Std.toFixed(2)})`]);
-        this.ShowRow( ["", "Range", (stat.N==0)?"":`${stat.Min} &mdash; ${stat.Max}`]);
+        this.ShowRow( [`<B>${stat.source ?? "All"}</B>`, "Lines, Readings", `${stat.lines}, ${stat.readings}`]);
+        this.ShowSummary( "", stat );
+        if ( stat.channels.length > 1 ) {
+            stat.channels.forEach( c => this.ShowSummary( `Channel ${c.channel+1} `, c ) );
+        }
+    }
+    ShowSummary( label, stat ) {
+        this.ShowRow( ["", `${label}Avg (Std)`, (stat.readings==0)?"":`${stat.avg.toFixed(2)} (${stat.std.toFixed(2)})`]);
+        this.ShowRow( ["", `${label}Range`, (stat.readings==0)?"":`${stat.min} &mdash; ${stat.max}`]);
     }
     ShowRow( row_data ) {
         const row = this.tbody.insertRow(-1);
@@ -471,7 +424,152 @@ class Month extends Week {
         }
     }
 }
-window.onload = () => {
+class Year extends Week {
+    Xlimits() {
+        this.X0 = 0;
+        this.X1 = 366;
+        this.scaleX = (this.width-2*this.padX)/(this.X1-this.X0) ;
+    }
+    make_grid() {
+        this.grid_base() ;
+
+        this.vert( 7, 1 ) ;
+        this.vert( 28, 2 ) ;
+        this.vert( 84, 4 ) ;
+                
+        this.ctx.font = `${this.fontX}px sans-serif` ;
+        this.ctx.fillStyle = "gray" ;
+        for ( let time = this.X0; time <= this.X1 ; time += 28 ) {
+            let date = new Date(globals.daystart);
+            date.setDate(date.getDate()-(this.X1-time)+1);
+            this.ctx.fillText(date.toLocaleDateString('en-US', {month: 'short', day: 'numeric'}),this.X(time),this.Y(this.Y0)+0.5);
+        }
+    }
+}
+class Calendar {
+    // Days with data for other months are fetched when the picker shows them
+    static loaded = new Set();
+    static load(year, month) {
+        const key = `${year}-${(month + 1).toString().padStart(2, '0')}`;
+        if ( this.loaded.has(key) ) {
+            return;
+        }
+        this.loaded.add(key);
+        fetch(`/api/calendar?month=${key}`, {credentials: 'same-origin'})
+        .then( r => r.ok ? r.json() : Promise.reject(r.status) )
+        .then( cal => {
+            const added = cal.days.map( d => d.date ).filter( d => !globals.goodDays.includes(d) );
+            if ( added.length > 0 ) {
+                globals.goodDays.push(...added);
+                globalThis.dp.update({});
+            }
+        })
+        .catch( err => console.log("Calendar", key, err) );
+    }
+}
+class Page {
+    // The page is a static shell: ?date=&type=&points= pick the data to fetch
+    static get(url) {
+        return fetch(url, {credentials: 'same-origin'})
+        .then( r => r.ok ? r.json() : Promise.reject(r.status) );
+    }
+    static load() {
+        const params = new URLSearchParams(location.search);
+        const type = params.get('type') ?? 'data';
+        const spans = ["week", "month", "year"];
+        let span = spans.includes(type) ? type : "day";
+        if ( type == "stat" && spans.includes(params.get('span')) ) {
+            span = params.get('span');
+        }
+        const dateQuery = new URLSearchParams();
+        if ( params.has('date') ) {
+            dateQuery.set('date', params.get('date'));
+        }
+        const dataQuery = new URLSearchParams(dateQuery);
+        if ( span == "day" || type == "stat" ) {
+            dataQuery.set('type', type);
+        }
+        if ( params.has('points') ) {
+            dataQuery.set('points', params.get('points'));
+        }
+        return Promise.all([
+            this.get(`/api/${span}?${dataQuery}`),
+            this.get(`/api/days?${dateQuery}`),
+        ])
+        .then( ([data, days]) => {
+            globals = Object.assign(data, days);
+            // Convert the date string back to a JS Date object
+            globals.daystart = new Date(globals.daystart);
+            const now = new Date();
+            globals.header_date = now.toLocaleDateString('en-US', {month: '2-digit', day: '2-digit', year: 'numeric'});
+            globals.header_time = now.toLocaleTimeString('en-GB', {hour: '2-digit', minute: '2-digit'});
+        });
+    }
+}
+class Search extends Data {
+    // Matches from all history, newest first, a page at a time
+    static setup() {
+        const box = document.getElementById("search");
+        box.hidden = !globals.search;
+        box.onkeydown = (event) => {
+            if ( event.key == "Enter" && box.value.trim() ) {
+                new Search( box.value.trim() ).Show();
+            }
+        };
+    }
+    constructor( text ) {
+        super();
+        this.text = text;
+        this.next = null;
+    }
+    Show() {
+        document.querySelectorAll(".non-plot").forEach(x => x.style.display = "block");
+        document.querySelectorAll(".yes-plot").forEach(x => x.style.display = "none");
+        this.table.classList.add("dataTable");
+        ["Time", "Source", "Data"].forEach( h => this.thead.insertCell(-1).innerHTML=`<B>${h}</B>` );
+        this.More();
+    }
+    More() {
+        const query = new URLSearchParams({q: this.text});
+        if ( this.next ) {
+            query.set('before', this.next);
+        }
+        Page.get(`/api/search?${query}`)
+        .then( result => {
+            this.tbody.querySelector(".more")?.remove();
+            result.rows.forEach( r => {
+                const row = this.tbody.insertRow(-1);
+                r.forEach( d => row.insertCell(-1).innerHTML = d );
+            });
+            this.next = result.next;
+            if ( this.next ) {
+                const cell = this.tbody.insertRow(-1).insertCell(-1);
+                cell.parentElement.classList.add("more");
+                cell.colSpan = 3;
+                const bu = document.createElement("button");
+                bu.innerHTML = "More";
+                bu.onclick = () => this.More();
+                cell.appendChild(bu);
+            }
+        })
+        .catch( err => console.log("Search", err) );
+    }
+}
+class Alerts {
+    // Rules firing now, shown beside the date; the latest events as tooltip
+    static load() {
+        Page.get('/api/alerts?limit=10')
+        .then( a => {
+            const span = document.getElementById("alerts");
+            span.textContent = a.firing.map( f => `\u26A0 ${f.rule}` ).join(" ");
+            span.title = a.events.map( e => `${new Date(e.ts*1000).toLocaleString()} ${e.message}` ).join("\n");
+        })
+        .catch( err => console.log("Alerts", err) );
+    }
+}
+window.onload = () => Page.load().then( () => {
+    Alerts.load();
+    Search.setup();
     const checkCalendarDate = (x) => {
         switch (x.cellType) {
             case 'day': return globals.goodDays.includes(JumpTo.YYYYMMDD(x.date));
@@ -486,6 +584,7 @@ window.onload = () => {
             buttons:[{content:'Today',onClick:(dp)=>JumpTo.date(new Date())}],
             selectedDates:[globals.daystart],
             onRenderCell(x) { if (checkCalendarDate(x)) return {classes:'present'}; },
+            onChangeViewDate({month, year}) { Calendar.load(year, month); },
     } ) ;
     new Swipe() ;
     
@@ -495,6 +594,7 @@ window.onload = () => {
         "plot":  { isPlot: true,  runner: () => new Plot().Show() },
         "week":  { isPlot: true,  runner: () => new Week().Show() },
         "month": { isPlot: true,  runner: () => new Month().Show() },
+        "year":  { isPlot: true,  runner: () => new Year().Show() },
         "data":  { isPlot: false, runner: () => new Data().Show() }
     };
 
@@ -512,9 +612,9 @@ window.onload = () => {
     // Device orientation transition hook registered once down at root level safely
     if ('orientation' in screen) {
         screen.orientation.onchange = () => {
-            if (["plot", "week", "month"].includes(globals.page_type)) {
+            if (["plot", "week", "month", "year"].includes(globals.page_type)) {
                 JumpTo.type(globals.page_type);
             }
         };
     }    
-} ;
+} ).catch( err => console.log("Page", err) ) ;
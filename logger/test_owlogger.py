@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# test_owlogger.py
+#
+# Database tests for owlogger.py
+# Run from this directory: python3 -m unittest test_owlogger
+#
+# MIT License
+
+import datetime as dt
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+import owlogger
+
+
+class DatabaseCase(unittest.TestCase):
+    # a fresh database file per test
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = owlogger.Database(os.path.join(self.tmp.name, "test.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+
+class ClientCase(DatabaseCase):
+    # requests through the Flask test client, without token or password
+
+    def setUp(self):
+        super().setUp()
+        self.saved = (owlogger.db, owlogger.no_password, owlogger.jwt_token, owlogger.write_behind)
+        owlogger.db, owlogger.no_password, owlogger.jwt_token, owlogger.write_behind = self.db, True, None, None
+        self.client = owlogger.app.test_client()
+
+    def tearDown(self):
+        owlogger.db, owlogger.no_password, owlogger.jwt_token, owlogger.write_behind = self.saved
+        super().tearDown()
+
+
+class ReaderPoolTest(DatabaseCase):
+
+    def test_readers_close_with_their_threads(self):
+        # the standalone server runs every request on a new thread
+        for _ in range(50):
+            thread = threading.Thread(target=self.db.fetch, args=("SELECT count(*) FROM datalog",))
+            thread.start()
+            thread.join()
+        self.assertLessEqual(len(self.db._readers), 1)
+
+
+class DateFilterPlanTest(DatabaseCase):
+    # the day page must search datalog by idx_date, not scan it
+
+    def plans(self, query):
+        # EXPLAIN QUERY PLAN of every datalog statement the reader runs for query()
+        statements = []
+        self.db._reader().set_trace_callback(statements.append)
+        try:
+            query()
+        finally:
+            self.db._reader().set_trace_callback(None)
+        statements = [ sql for sql in statements if "datalog" in sql ]
+        self.assertTrue(statements)
+        return [
+            " | ".join(row[3] for row in self.db.fetch("EXPLAIN QUERY PLAN " + sql))
+            for sql in statements ]
+
+    def assertUsesDateIndex(self, query):
+        for plan in self.plans(query):
+            self.assertIn("USING INDEX idx_date", plan)
+            self.assertNotIn("SCAN d", plan)
+
+    def test_day_data(self):
+        self.assertUsesDateIndex(lambda: self.db.day_data(dt.datetime(2025, 7, 1)))
+
+
+class IngestTest(ClientCase):
+
+    def test_numeric_data_is_stored_as_text(self):
+        response = self.client.post('/', json={"name": "esp", "data": 21.5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.db.fetch("SELECT value FROM datalog"), [("21.5",)])
+        self.assertEqual(self.db.fetch("SELECT value FROM readings"), [(21.5,)])
+
+
+class BulkTest(ClientCase):
+
+    def test_mixed_items(self):
+        response = self.client.post('/bulk', json=[
+            {"name": "esp", "data": "1", "time": "2025-07-01T12:00:00Z"},
+            {"name": "esp"},
+            "not an object",
+            {"name": "esp", "data": 2.5, "time": 1751371260},
+            {"name": "esp", "data": "3", "time": "yesterday"} ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["stored"], 2)
+        self.assertEqual(response.json["rejected"], 3)
+        self.assertEqual(
+            [ item["status"] for item in response.json["items"] ],
+            ["ok", "error", "error", "ok", "error"])
+        self.assertEqual(
+            self.db.fetch("SELECT date, value FROM datalog ORDER BY id"),
+            [("2025-07-01 12:00:00", "1"), ("2025-07-01 12:01:00", "2.5")])
+
+    def test_ndjson(self):
+        body = '{"name": "esp", "data": "1"}\n\n{"name": "esp", "data": "2"}\n'
+        response = self.client.post('/bulk', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["stored"], 2)
+        self.assertEqual(self.db.fetch("SELECT count(*) FROM datalog"), [(2,)])
+
+    def test_bad_body(self):
+        for body in ('[{"name": "esp"', '{"data": "1"} {"data": "2"}', '[1] [2]'):
+            self.assertEqual(self.client.post('/bulk', data=body).status_code, 400)
+        self.assertEqual(self.db.fetch("SELECT count(*) FROM datalog"), [(0,)])
+
+    def test_too_many_items(self):
+        with mock.patch.object(owlogger, "_BULK_MAX", 3):
+            items = [ {"name": "esp", "data": str(i)} for i in range(4) ]
+            self.assertEqual(self.client.post('/bulk', json=items).status_code, 413)
+            self.assertEqual(self.client.post('/bulk', json=items[:3]).status_code, 200)
+        self.assertEqual(self.db.fetch("SELECT count(*) FROM datalog"), [(3,)])
+
+
+class WriteBehindTest(DatabaseCase):
+
+    def test_bad_sample_does_not_stop_the_writer(self):
+        queue = owlogger.WriteBehind(self.db, batch_delay=0.05)
+        self.assertTrue(queue.put("esp", "1"))
+        # not a datetime: add_many() raises for this row only
+        queue._queue.put(("esp", "2", "yesterday"))
+        self.assertTrue(queue.put("esp", 3.5))
+        queue.close()
+        self.assertEqual(queue.failed, 1)
+        self.assertEqual(queue.committed, 2)
+        self.assertEqual(sorted(self.db.fetch("SELECT value FROM datalog")), [("1",), ("3.5",)])
+        self.assertTrue(queue.put("esp", "4"))
+        queue.close()
+        self.assertEqual(self.db.fetch("SELECT count(*) FROM datalog"), [(3,)])
+
+
+class RetentionTest(DatabaseCase):
+
+    def test_raw_days(self):
+        now = dt.datetime.now(dt.timezone.utc)
+        cutoff = now - dt.timedelta(days=5)
+        # one row either side of the cut-off, on the day it falls in
+        cut_day = dt.date.fromtimestamp(cutoff.timestamp())
+        day_start = owlogger._local_midnight_utc(cut_day)
+        day_end = owlogger._local_midnight_utc(cut_day + dt.timedelta(days=1))
+        self.db.add_many([
+            ("esp", "1", now - dt.timedelta(days=10)),
+            ("esp", "2", cutoff - (cutoff - day_start) / 2),
+            ("esp", "3", cutoff + (day_end - cutoff) / 2),
+            ("esp", "4", now - dt.timedelta(days=1)) ])
+        rollups = self.db.fetch("SELECT (SELECT count(*) FROM rollup_hour), (SELECT count(*) FROM rollup_day)")
+
+        report = self.db.enforce_retention(raw_days=5, batch=1, pause=0)
+        self.assertEqual(report["datalog"], 2)
+        self.assertEqual(report["readings"], 2)
+        self.assertEqual(sorted(self.db.fetch("SELECT value FROM datalog")), [("3",), ("4",)])
+        self.assertEqual(sorted(self.db.fetch("SELECT value FROM readings")), [(3.0,), (4.0,)])
+        # rollups have their own retention
+        self.assertEqual(
+            self.db.fetch("SELECT (SELECT count(*) FROM rollup_hour), (SELECT count(*) FROM rollup_day)"),
+            rollups)
+        self.assertEqual(
+            self.db.fetch("SELECT row_count FROM calendar_days WHERE local_date <= ?", (cut_day.isoformat(),)),
+            [(1,)])
+
+
+class PartitionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = owlogger.Database(os.path.join(self.tmp.name, "test.db"), partition="month")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_batch_over_more_files_than_can_be_attached(self):
+        months = owlogger.Database.MAX_ATTACHED + 4
+        self.db.add_many([
+            ("esp", str(month), dt.datetime(2025, 1, 1, tzinfo=dt.timezone.utc) + dt.timedelta(days=31 * month))
+            for month in range(months) ])
+        self.assertEqual(len(self.db._existing_partitions()), months)
+        self.assertEqual(
+            self.db._fetch_parts("SELECT value FROM {db}.datalog"),
+            [ (str(month),) for month in range(months) ])
+        rows = list(self.db.export_rows(dt.date(2024, 12, 31), dt.date(2026, 12, 31)))
+        self.assertEqual([row[5] for row in rows], [str(month) for month in range(months)])
+        # ids restart in each file; (partition, id) is unique
+        self.assertEqual(len({row[:2] for row in rows}), months)
+
+
+class AlertTest(unittest.TestCase):
+    # rules fire and clear at ingest; hooks are stubbed, nothing is run or posted
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.alerts = owlogger.Alerts([
+            {"name": "warm", "source": "freezer", "above": -10, "command": "true"} ])
+        self.hooked = []
+        self.done = threading.Event()
+        def run_hooks(events):
+            self.hooked.extend( (rule.name, event["event"]) for rule, event in events )
+            self.done.set()
+        self.alerts._run_hooks = run_hooks
+        self.db = owlogger.Database(os.path.join(self.tmp.name, "test.db"), alerts=self.alerts)
+        self.saved = (owlogger.db, owlogger.no_password)
+        owlogger.db, owlogger.no_password = self.db, True
+
+    def tearDown(self):
+        owlogger.db, owlogger.no_password = self.saved
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_fire_and_clear(self):
+        now = dt.datetime.now(dt.timezone.utc)
+        self.db.add_many([("freezer", "-5", now - dt.timedelta(minutes=2))])
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(self.hooked, [("warm", "fired")])
+        self.assertEqual([name for name, since in self.db.alert_firing()], ["warm"])
+        self.done.clear()
+        self.db.add_many([("freezer", "-15", now - dt.timedelta(minutes=1))])
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(self.hooked, [("warm", "fired"), ("warm", "cleared")])
+        self.assertEqual(self.db.alert_firing(), [])
+
+    def test_events_limit_is_clamped(self):
+        now = dt.datetime.now(dt.timezone.utc)
+        self.db.add_many([("freezer", "-5", now - dt.timedelta(minutes=2))])
+        self.db.add_many([("freezer", "-15", now - dt.timedelta(minutes=1))])
+        client = owlogger.app.test_client()
+        self.assertEqual(len(client.get('/api/alerts').json["events"]), 2)
+        self.assertEqual(len(client.get('/api/alerts?limit=-1').json["events"]), 1)
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "test.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_other_files_beside_an_unpartitioned_database(self):
+        # not a partition name, and partitioning is off anyway
+        open(os.path.join(self.tmp.name, "test-backup.db"), "w").close()
+        db = owlogger.Database(self.path, search=True)
+        try:
+            db.add_many([("freezer", "door open", dt.datetime(2025, 7, 1, tzinfo=dt.timezone.utc))])
+            self.assertEqual([row[3:] for row in db.search("door")], [("freezer", "door open")])
+        finally:
+            db.close()
+
+    def test_one_write_into_new_partitions(self):
+        # each new file's index is built, and committed, before the next is attached
+        db = owlogger.Database(self.path, partition="month", search=True)
+        try:
+            db.add_many([
+                ("freezer", f"door open {month}", dt.datetime(2025, month, 1, tzinfo=dt.timezone.utc))
+                for month in (1, 2, 3) ])
+            self.assertEqual(
+                [row[4] for row in db.search("door")], ["door open 3", "door open 2", "door open 1"])
+        finally:
+            db.close()
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptedMigration(owlogger.Database):
+    # stops the process (raises) after a number of committed source id transactions
+    writes = None
+
+    def _migrate_source_ids(self, version):
+        self.writes = 0
+        super()._migrate_source_ids(version)
+
+    @contextmanager
+    def _writing(self, *args, **kwargs):
+        with super()._writing(*args, **kwargs) as conn:
+            yield conn
+        if self.writes is not None:
+            self.writes += 1
+            if self.writes == 3:
+                raise Interrupted
+
+
+class SourceIdMigrationTest(unittest.TestCase):
+    # a database as the original owlogger.py left it, source as text
+
+    ROWS = 10
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "test.db")
+        self.day = dt.date(2025, 7, 1)
+        start = owlogger._local_midnight_utc(self.day)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                """CREATE TABLE datalog (
+                    id INTEGER PRIMARY KEY,
+                    date DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    source TEXT DEFAULT '',
+                    value TEXT
+                );""")
+            conn.execute("""CREATE INDEX idx_date ON datalog(date);""")
+            conn.executemany(
+                """INSERT INTO datalog(date, source, value) VALUES (?, ?, ?)""",
+                [ (owlogger._sql_time(start + dt.timedelta(minutes=i)), f"sensor{i % 3}", str(i))
+                  for i in range(self.ROWS) ])
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def raw(self, sql):
+        with sqlite3.connect(self.path) as conn:
+            rows = conn.execute(sql).fetchall()
+        conn.close()
+        return rows
+
+    def test_resume_after_interrupted_batch(self):
+        with mock.patch.object(owlogger.Database, "MIGRATION_BATCH", 4):
+            with self.assertRaises(Interrupted):
+                InterruptedMigration(self.path)
+            # renamed, two datalog batches moved
+            self.assertEqual(self.raw("SELECT version FROM version"), [(5,)])
+            self.assertEqual(self.raw("SELECT count(*) FROM datalog_old"), [(self.ROWS - 8,)])
+            self.assertEqual(self.raw("SELECT count(*) FROM readings_old"), [(self.ROWS,)])
+
+            db = owlogger.Database(self.path)
+        try:
+            self.assertEqual(db.get_version(), owlogger.Database.MIGRATIONS[-1][0])
+            self.assertEqual(db.fetch("SELECT count(*) FROM datalog"), [(self.ROWS,)])
+            self.assertEqual(db.fetch("SELECT count(*) FROM readings"), [(self.ROWS,)])
+            self.assertEqual(
+                db.fetch("SELECT name FROM sqlite_master WHERE name LIKE '%_old'"), [])
+            self.assertEqual(
+                db.fetch("SELECT tbl_name FROM sqlite_master WHERE name = 'idx_date'"), [("datalog",)])
+            self.assertEqual(
+                [ (source, value) for _, source, value in db.day_data(self.day) ],
+                [ (f"sensor{i % 3}", str(i)) for i in range(self.ROWS) ])
+        finally:
+            db.close()
+
+
+@unittest.skipIf(owlogger.np is None, "NumPy is not installed")
+class RenderTest(DatabaseCase):
+    # the NumPy and pure-Python plotting paths draw the same pixels
+
+    def setUp(self):
+        super().setUp()
+        self.saved = (owlogger.db, owlogger.np)
+        owlogger.db = self.db
+        now = dt.datetime.now(dt.timezone.utc)
+        self.db.add_many([
+            (f"sensor{i % 4}", f"{(i * 7) % 13 * 0.5} {i % 5}" if i % 6 == 0 else str((i * 7) % 13 * 0.5),
+             now - dt.timedelta(minutes=7 * i))
+            for i in range(200) ])
+
+    def tearDown(self):
+        owlogger.db, owlogger.np = self.saved
+        super().tearDown()
+
+    def frames(self, mode):
+        numpy = self.saved[1]
+        # both renders in the same minute, so they plot the same window
+        for attempt in range(3):
+            minute = int(time.time() // 60)
+            owlogger.np = numpy
+            fast = owlogger.EPaperBitMap(mode=mode).plot().tobytes()
+            owlogger.np = None
+            slow = owlogger.EPaperBitMap(mode=mode).plot().tobytes()
+            if minute == int(time.time() // 60):
+                return fast, slow
+        self.fail("renders kept crossing a minute")
+
+    def test_points(self):
+        fast, slow = self.frames("points")
+        self.assertEqual(fast, slow)
+
+    def test_range(self):
+        fast, slow = self.frames("range")
+        self.assertEqual(fast, slow)
+
+
+if __name__ == "__main__":
+    unittest.main()